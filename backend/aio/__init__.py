@@ -0,0 +1,9 @@
+# aio/__init__.py
+"""
+asyncio variant of the API, served by Quart on an ASGI server (see asgi.py).
+
+It exposes the same routes as the Flask blueprints but awaits MongoDB through
+pymongo's ``AsyncMongoClient``, so a worker holds no thread while a query or a
+Stripe call is in flight. Request parsing, formatting, caching and the
+collection/index layout are shared with the Flask app.
+"""
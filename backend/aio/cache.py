@@ -0,0 +1,54 @@
+# aio/cache.py
+"""
+``cache.cached`` for Quart views. Entries live in the same ``response_cache``
+and use the same keys, tags, ETags and compressed bodies as the Flask app.
+"""
+import hashlib
+from functools import wraps
+from quart import request, make_response
+from quart.wrappers.response import IterableBody
+from cache import response_cache, encoded_body
+import response_compression
+
+
+async def _conditional_response(entry):
+    body, content_type, etag, _ = entry
+    mimetype = content_type.split(";")[0]
+    encoding = response_compression.negotiate(request.accept_encodings, mimetype, len(body))
+    etag = response_compression.encoded_etag(etag, encoding)
+    if request.if_none_match.contains_weak(etag):
+        response = await make_response("", 304)
+    else:
+        response = await make_response(encoded_body(entry, encoding), 200)
+        response.content_type = content_type
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    if response_compression.is_compressible(mimetype):
+        response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def cached(*tags):
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            key = f"{request.host_url}{request.full_path}"
+            entry = response_cache.get(key)
+            if entry is not None:
+                return await _conditional_response(entry)
+
+            entry_tags = [tag.format(**kwargs) for tag in tags]
+            generation = response_cache.generation(entry_tags)
+            response = await make_response(await view(*args, **kwargs))
+            # Streamed listings are never buffered into the cache
+            if response.status_code != 200 or isinstance(response.response, IterableBody):
+                return response
+
+            body = await response.get_data()
+            entry = (body, response.content_type, hashlib.sha1(body).hexdigest(), {})
+            response_cache.set(key, entry, entry_tags, generation)
+            return await _conditional_response(entry)
+        return wrapper
+    return decorator
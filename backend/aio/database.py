@@ -0,0 +1,64 @@
+# aio/database.py
+"""
+Async counterparts of the collections in ``database.py``.
+
+The ``AsyncMongoClient`` is bound to the event loop it first runs on, so one
+is created lazily per process and per loop, with the same options (pooling,
+timeouts, read routing, metrics listeners) as the synchronous client.
+"""
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient
+import database
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_owner = None
+
+
+def get_client():
+    """
+    Return the AsyncMongoClient for the running event loop, creating it on first use.
+    """
+    global _client, _client_owner
+    owner = (os.getpid(), asyncio.get_running_loop())
+    if _client is None or _client_owner != owner:
+        load_dotenv()
+        mongo_uri = os.getenv("MONGO_URI")
+        if not mongo_uri:
+            raise ValueError("MONGO_URI not found in .env file")
+        _client = AsyncMongoClient(mongo_uri, **database.client_options(mongo_uri))
+        _client_owner = owner
+        logger.info("Async MongoDB client configured", extra={"pid": owner[0]})
+    return _client
+
+
+def get_db():
+    return get_client()[database.database_name()]
+
+
+class LazyCollection(database.LazyCollection):
+    """
+    ``database.LazyCollection`` resolved against the async client.
+    """
+    def _get_client(self):
+        return get_client()
+
+
+users_collection = LazyCollection("users")
+events_collection = LazyCollection("events")
+registrations_collection = LazyCollection("registrations")
+feedbacks_collection = LazyCollection("feedbacks")
+comments_collection = LazyCollection("comments")
+feedback_summaries_collection = LazyCollection("feedback_summaries")
+stripe_events_collection = LazyCollection("stripe_events")
+payment_sessions_collection = LazyCollection("payment_sessions")
+rate_limits_collection = LazyCollection("rate_limits")
+
+events_read_collection = LazyCollection("events", read_only=True)
+comments_read_collection = LazyCollection("comments", read_only=True)
+feedbacks_read_collection = LazyCollection("feedbacks", read_only=True)
+feedback_summaries_read_collection = LazyCollection("feedback_summaries", read_only=True)
@@ -0,0 +1,63 @@
+# aio/rate_limit.py
+"""
+``rate_limit.rate_limited`` for Quart views, with the same limits, memory
+buckets and concurrency limiters as the Flask app.
+"""
+import logging
+from functools import wraps
+from quart import request, jsonify
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from aio.database import rate_limits_collection
+from rate_limit import (ENABLED, BACKEND, LIMITS, MemoryBackend, bucket_update, bucket_result, concurrency_limiters,
+                        client_keys, too_many_requests, server_busy)
+
+logger = logging.getLogger(__name__)
+
+
+class MongoBackend:
+    async def take(self, key, limit):
+        try:
+            bucket = await rate_limits_collection.find_one_and_update(
+                {"_id": key}, bucket_update(limit), upsert=True, return_document=ReturnDocument.AFTER)
+        except PyMongoError as e:
+            logger.warning("Rate limit check failed, allowing request: %s", e)
+            return True, 0
+        return bucket_result(bucket, limit)
+
+
+class AsyncMemoryBackend(MemoryBackend):
+    async def take(self, key, limit):
+        # Never blocks for long: the lock only guards a dict update
+        return super().take(key, limit)
+
+
+backend = MongoBackend() if BACKEND == "mongo" else AsyncMemoryBackend()
+
+
+def rate_limited(name):
+    limit = LIMITS[name]
+    limiter = concurrency_limiters.get(name)
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return await view(*args, **kwargs)
+            data = await request.get_json(silent=True) if request.is_json else None
+            for key in client_keys(name, data, request.remote_addr):
+                allowed, retry_after = await backend.take(key, limit)
+                if not allowed:
+                    body, status, headers = too_many_requests(name, retry_after)
+                    return jsonify(body), status, headers
+            if limiter is None:
+                return await view(*args, **kwargs)
+            if not limiter.try_acquire():
+                body, status, headers = server_busy(name)
+                return jsonify(body), status, headers
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                limiter.release()
+        return wrapper
+    return decorator
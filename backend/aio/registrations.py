@@ -0,0 +1,89 @@
+# aio/registrations.py
+"""
+Async versions of the request-path helpers in ``registrations.py``, with the
+same outcomes, exceptions and cache invalidation.
+"""
+from datetime import datetime, timezone
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from aio.database import events_collection, registrations_collection, payment_sessions_collection
+from models.registration_model import Registration
+from cache import response_cache
+from registrations import REGISTERED, ALREADY_REGISTERED, SESSION_PROCESSED, EventNotFound
+
+
+async def _attendee_count(event_id):
+    event = await events_collection.find_one({"_id": ObjectId(event_id)}, {"attendee_count": 1})
+    if not event:
+        raise EventNotFound(event_id)
+    return event.get("attendee_count", 0)
+
+
+async def register_user(event_id, user_id, session_id=None):
+    """
+    See ``registrations.register_user``.
+    """
+    if not ObjectId.is_valid(event_id):
+        raise EventNotFound(event_id)
+    if session_id:
+        try:
+            await payment_sessions_collection.insert_one({
+                "_id": session_id,
+                "event_id": event_id,
+                "user_id": user_id,
+                "created_at": datetime.now(timezone.utc)
+            })
+        except DuplicateKeyError:
+            return SESSION_PROCESSED, await _attendee_count(event_id)
+
+    try:
+        await registrations_collection.insert_one(Registration(user_id, event_id, session_id).to_dict())
+    except DuplicateKeyError:
+        return ALREADY_REGISTERED, await _attendee_count(event_id)
+    except Exception:
+        await _release_session(session_id)
+        raise
+
+    event = await events_collection.find_one_and_update(
+        {"_id": ObjectId(event_id)},
+        {"$inc": {"attendee_count": 1}},
+        projection={"attendee_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if event is None:
+        await registrations_collection.delete_one({"event_id": event_id, "user_id": user_id})
+        await _release_session(session_id)
+        raise EventNotFound(event_id)
+
+    response_cache.invalidate("events", f"user:{user_id}")
+    return REGISTERED, event["attendee_count"]
+
+
+async def _release_session(session_id):
+    if session_id:
+        await payment_sessions_collection.delete_one({"_id": session_id})
+
+
+async def is_registered(event_id, user_id):
+    return await registrations_collection.find_one(
+        {"event_id": event_id, "user_id": user_id}, {"_id": 1}
+    ) is not None
+
+
+async def attendees_for_events(event_ids):
+    attendees = {event_id: [] for event_id in event_ids}
+    if not event_ids:
+        return attendees
+    async for registration in registrations_collection.find(
+        {"event_id": {"$in": list(event_ids)}}, {"_id": 0, "event_id": 1, "user_id": 1}
+    ):
+        attendees[registration["event_id"]].append(registration["user_id"])
+    return attendees
+
+
+async def registered_event_ids(user_id):
+    return [
+        registration["event_id"]
+        async for registration in registrations_collection.find({"user_id": user_id}, {"_id": 0, "event_id": 1})
+    ]
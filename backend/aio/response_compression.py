@@ -0,0 +1,27 @@
+# aio/response_compression.py
+"""
+``response_compression.init_app`` for the Quart app.
+"""
+from quart import request
+from quart.wrappers.response import DataBody
+from response_compression import negotiate, compress, encoded_etag, is_compressible
+
+
+def init_app(app):
+    @app.after_request
+    async def _compress_response(response):
+        # File and streamed bodies are not DataBody and are never buffered here
+        if (response.status_code != 200 or not isinstance(response.response, DataBody)
+                or "Content-Encoding" in response.headers or not is_compressible(response.mimetype or "")):
+            return response
+        response.vary.add("Accept-Encoding")
+        data = await response.get_data()
+        encoding = negotiate(request.accept_encodings, response.mimetype, len(data))
+        if encoding is None:
+            return response
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(encoded_etag(etag, encoding), weak)
+        return response
@@ -0,0 +1,51 @@
+# aio/routes/auth_routes.py
+from quart import Blueprint, request, jsonify
+from aio.database import users_collection
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timezone
+import logging
+
+auth_blueprint = Blueprint("auth", __name__)
+logger = logging.getLogger(__name__)
+
+@auth_blueprint.route("/store-user", methods=["POST"])
+async def store_user():
+    try:
+        user_data = await request.get_json()
+        
+        clerk_id = user_data.get('clerk_id')
+        email = user_data.get('email')
+        
+        if not clerk_id or not email:
+            return jsonify({"error": "Missing required fields"}), 400
+        
+        user_document = {
+            'clerk_id': clerk_id,
+            'email': email,
+            'username': user_data.get('username'),
+            'first_name': user_data.get('first_name'),
+            'last_name': user_data.get('last_name'),
+            'profile_image_url': user_data.get('profile_image_url'),
+            'created_at': datetime.now(timezone.utc),
+            'last_login': datetime.now(timezone.utc)
+        }
+        
+        try:
+            result = await users_collection.insert_one(user_document)
+            return jsonify({
+                "message": "User added to database successfully",
+                "user_id": str(result.inserted_id),
+                "clerk_id": clerk_id
+            }), 201
+        
+        except DuplicateKeyError:
+            existing_user = await users_collection.find_one({'clerk_id': clerk_id})
+            return jsonify({
+                "message": "User already exists",
+                "user_id": str(existing_user['_id']),
+                "clerk_id": clerk_id
+            }), 409
+    
+    except Exception as e:
+        logger.exception("Error in user sync: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
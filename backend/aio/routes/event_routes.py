@@ -0,0 +1,621 @@
+# aio/routes/event_routes.py
+from quart import Blueprint, request, jsonify, send_from_directory, make_response, Response
+from werkzeug.exceptions import NotFound, RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+from aio.database import events_collection, comments_collection, events_read_collection, comments_read_collection
+from aio.registrations import register_user, is_registered, attendees_for_events, registered_event_ids
+from aio.cache import cached
+from aio.webhooks import enqueue_event
+from aio.rate_limit import rate_limited
+from json_provider import async_json_array_stream, async_ndjson_stream
+from streams import (broadcaster, format_sse, attendee_count_message, HEARTBEAT_SECONDS, SUBSCRIBER_QUEUE_SIZE,
+                     RETRY_SECONDS)
+from registrations import EventNotFound, REGISTERED, SESSION_PROCESSED
+from cache import response_cache
+from images import (UPLOAD_FOLDER, MAX_UPLOAD_BYTES, UploadTooLarge, store_upload, is_content_addressed,
+                    IMAGE_SERVE_MODE, IMAGE_ACCEL_PREFIX, IMMUTABLE_MAX_AGE, LEGACY_MAX_AGE)
+# Request validation and response shapes are shared with the Flask routes
+from routes.event_routes import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, DEFAULT_COMMENT_PAGE_SIZE, _listing_projection,
+                                 _format_event, _encode_cursor, _decode_cursor, _keyset_after, _format_comment,
+                                 _apply_date_filter, _search_pipeline, REGISTERED_SECTIONS, _utc_now_iso,
+                                 _registered_section_query, _parse_stream_ids, STREAM_BATCH_SIZE, _missing_fields,
+                                 _event_document, _parse_bulk_line, _add_bulk_error, _add_bulk_write_errors,
+                                 _bulk_result, _export_disposition, _export_projection, _format_export_event,
+                                 BULK_BATCH_SIZE)
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+import asyncio
+import os
+import stripe
+import urllib.parse
+import logging
+import json
+import mimetypes
+from datetime import datetime
+
+event_blueprint = Blueprint("event_routes", __name__)
+logger = logging.getLogger(__name__)
+
+@event_blueprint.route('/health', methods=['GET'])
+async def health_check():
+    return jsonify({"status": "healthy", "message": "Server is running"}), 200
+
+@event_blueprint.route("/create", methods=["POST"])
+async def create_event():
+    data = await request.get_json()
+
+    if _missing_fields(data):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    event_id = (await events_collection.insert_one(_event_document(data))).inserted_id
+    response_cache.invalidate("events")
+    return jsonify({"message": "Event created successfully", "event_id": str(event_id)}), 201
+
+
+async def _insert_bulk_batch(report, batch, line_numbers):
+    try:
+        report["inserted"] += len((await events_collection.insert_many(batch, ordered=False)).inserted_ids)
+    except BulkWriteError as e:
+        _add_bulk_write_errors(report, line_numbers, e)
+
+
+async def _body_lines():
+    # The body arrives in arbitrary chunks; yield it a line at a time
+    pending = b""
+    async for chunk in request.body:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+@event_blueprint.route("/bulk", methods=["POST"])
+async def bulk_create_events():
+    report = {"inserted": 0, "failed": 0, "errors": []}
+    batch, line_numbers = [], []
+    line_number = 0
+    async for line in _body_lines():
+        line_number += 1
+        if not line.strip():
+            continue
+        event, error = _parse_bulk_line(line)
+        if error:
+            _add_bulk_error(report, line_number, error)
+            continue
+        batch.append(event)
+        line_numbers.append(line_number)
+        if len(batch) == BULK_BATCH_SIZE:
+            await _insert_bulk_batch(report, batch, line_numbers)
+            batch, line_numbers = [], []
+    if batch:
+        await _insert_bulk_batch(report, batch, line_numbers)
+    body, status = _bulk_result(report)
+    return jsonify(body), status
+
+
+async def _with_attendees(events, summary):
+    if not summary and events:
+        attendees = await attendees_for_events([event["_id"] for event in events])
+        for event in events:
+            event["attendees"] = attendees[event["_id"]]
+    return events
+
+
+async def _listing_response(events, next_token, summary, paginated):
+    base_url = request.host_url.rstrip('/')
+    events = await _with_attendees([_format_event(event, base_url) for event in events], summary)
+
+    if paginated:
+        return jsonify({"events": events, "next": next_token}), 200
+    return jsonify(events), 200
+
+
+def _stream_listing(cursor, summary, stream_format, format_event=None):
+    """
+    See ``routes.event_routes._stream_listing``.
+    """
+    if format_event is None:
+        base_url = request.host_url.rstrip('/')
+        format_event = lambda event: _format_event(event, base_url)
+
+    async def events():
+        batch = []
+        async for event in cursor.batch_size(STREAM_BATCH_SIZE):
+            batch.append(format_event(event))
+            if len(batch) == STREAM_BATCH_SIZE:
+                for item in await _with_attendees(batch, summary):
+                    yield item
+                batch = []
+        for item in await _with_attendees(batch, summary):
+            yield item
+
+    if stream_format == "ndjson":
+        response = Response(async_ndjson_stream(events()), mimetype="application/x-ndjson")
+    else:
+        response = Response(async_json_array_stream(events()), mimetype="application/json")
+    response.timeout = None
+    return response
+
+
+async def _list_events(query, paginated=None):
+    """
+    See ``routes.event_routes._list_events``.
+    """
+    summary = request.args.get("view") == "summary"
+    _apply_date_filter(query, request.args)
+
+    if paginated is None:
+        paginated = "limit" in request.args or "cursor" in request.args
+    if paginated:
+        try:
+            limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        token = request.args.get("cursor")
+        if token:
+            try:
+                last_date, last_id = _decode_cursor(token)
+            except Exception:
+                return jsonify({"error": "Invalid cursor"}), 400
+            query = {"$and": [query, _keyset_after("date", last_date, last_id)]}
+
+    cursor = events_read_collection.find(query, _listing_projection()).sort([("date", 1), ("_id", 1)])
+    stream_format = request.args.get("stream")
+    if not paginated and stream_format in ("json", "ndjson"):
+        return _stream_listing(cursor, summary, stream_format)
+    if paginated:
+        cursor = cursor.limit(limit + 1)
+    events = await cursor.to_list()
+
+    next_token = None
+    if paginated and len(events) > limit:
+        events = events[:limit]
+        next_token = _encode_cursor(events[-1].get("date"), events[-1]["_id"])
+
+    return await _listing_response(events, next_token, summary, paginated)
+
+@event_blueprint.route("/all", methods=["GET"])
+@cached("events")
+async def get_all_events():
+    return await _list_events({})
+
+@event_blueprint.route("/my-events/<user_id>", methods=["GET"])
+@cached("events")
+async def get_user_events(user_id):
+    return await _list_events({"organizer_id": user_id})
+
+@event_blueprint.route("/export/<organizer_id>", methods=["GET"])
+async def export_events(organizer_id):
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in ("json", "ndjson"):
+        return jsonify({"error": "format must be json or ndjson"}), 400
+    cursor = events_read_collection.find({"organizer_id": organizer_id}, _export_projection()).sort(
+        [("date", 1), ("_id", 1)])
+    response = _stream_listing(cursor, False, export_format, format_event=_format_export_event)
+    response.headers["Content-Disposition"] = _export_disposition(organizer_id, export_format)
+    return response
+
+@event_blueprint.route("/search", methods=["GET"])
+@cached("events")
+async def search_events():
+    query = {}
+    if request.args.get("organizer_id"):
+        query["organizer_id"] = request.args["organizer_id"]
+
+    text = request.args.get("q", "").strip()
+    if not text:
+        return await _list_events(query, paginated=True)
+
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    try:
+        pipeline = _search_pipeline(text, _apply_date_filter(query, request.args), limit, request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    events = await (await events_read_collection.aggregate(pipeline)).to_list()
+
+    next_token = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_token = _encode_cursor(events[-1]["score"], events[-1]["_id"])
+    for event in events:
+        del event["score"]
+
+    return await _listing_response(events, next_token, request.args.get("view") == "summary", paginated=True)
+
+async def _registered_page(event_ids, section, now, limit, token=None):
+    if not event_ids:
+        return {"events": [], "next": None}
+    query, sort = _registered_section_query(event_ids, section, now, token)
+    events = await events_read_collection.find(query, _listing_projection()).sort(sort).limit(limit + 1).to_list()
+    next_token = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_token = _encode_cursor(events[-1].get("date"), events[-1]["_id"])
+    base_url = request.host_url.rstrip('/')
+    return {"events": [_format_event(event, base_url) for event in events], "next": next_token}
+
+@event_blueprint.route("/registered/<user_id>", methods=["GET"])
+@cached("events", "user:{user_id}")
+async def get_registered_events(user_id):
+    status = request.args.get("status")
+    if status and status not in REGISTERED_SECTIONS:
+        return jsonify({"error": "status must be 'upcoming' or 'past'"}), 400
+
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    event_ids = [ObjectId(event_id) for event_id in await registered_event_ids(user_id) if ObjectId.is_valid(event_id)]
+    now = _utc_now_iso()
+
+    try:
+        if status:
+            return jsonify(await _registered_page(event_ids, status, now, limit, request.args.get("cursor"))), 200
+        return jsonify({section: await _registered_page(event_ids, section, now, limit)
+                        for section in REGISTERED_SECTIONS}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@event_blueprint.route("/images/<path:filename>", methods=["GET"])
+async def get_image(filename):
+    try:
+        if is_content_addressed(filename):
+            secure_name = filename
+            max_age = IMMUTABLE_MAX_AGE
+        else:
+            secure_name = secure_filename(urllib.parse.unquote(filename))
+            max_age = LEGACY_MAX_AGE
+        
+        if IMAGE_SERVE_MODE in ("x-accel", "x-sendfile"):
+            file_path = os.path.join(UPLOAD_FOLDER, secure_name)
+            if not os.path.isfile(file_path):
+                return jsonify({"error": "Image not found"}), 404
+            response = await make_response("")
+            response.content_type = mimetypes.guess_type(secure_name)[0] or "application/octet-stream"
+            if IMAGE_SERVE_MODE == "x-accel":
+                response.headers["X-Accel-Redirect"] = f"{IMAGE_ACCEL_PREFIX}/{secure_name}"
+            else:
+                response.headers["X-Sendfile"] = os.path.abspath(file_path)
+        else:
+            try:
+                response = await send_from_directory(UPLOAD_FOLDER, secure_name)
+            except NotFound:
+                return jsonify({"error": "Image not found"}), 404
+        
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        if max_age == IMMUTABLE_MAX_AGE:
+            response.cache_control.immutable = True
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@event_blueprint.route("/upload-image", methods=["POST"])
+@rate_limited("upload")
+async def upload_image():
+    request.max_content_length = MAX_UPLOAD_BYTES
+    if request.content_length and request.content_length > MAX_UPLOAD_BYTES:
+        return jsonify({"error": f"Image exceeds {MAX_UPLOAD_BYTES} bytes"}), 413
+    
+    try:
+        files = await request.files
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Image exceeds {MAX_UPLOAD_BYTES} bytes"}), 413
+    if 'file' not in files:
+        return jsonify({"error": "No file part"}), 400
+    
+    file = files['file']
+    if file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+    
+    try:
+        # Hashing and writing to disk are blocking; keep them off the event loop
+        image_url = await asyncio.to_thread(store_upload, file)
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"image_url": image_url}), 200
+
+@event_blueprint.route("/register/<event_id>", methods=["POST"])
+@rate_limited("register")
+async def register_for_event(event_id):
+    data = await request.get_json()
+    user_id = data.get("user_id")
+
+    if not user_id:
+        return jsonify({"error": "User ID is required"}), 400
+
+    if not ObjectId.is_valid(event_id):
+        return jsonify({"error": "Invalid event ID format"}), 400
+
+    try:
+        outcome, _ = await register_user(event_id, user_id)
+    except EventNotFound:
+        return jsonify({"error": "Event not found"}), 404
+
+    if outcome != REGISTERED:
+        return jsonify({"message": "User already registered"}), 200
+
+    return jsonify({"message": "User registered successfully"}), 200
+
+@event_blueprint.route("/update-images/<event_id>", methods=["PUT"])
+async def update_event_images(event_id):
+    data = await request.get_json()
+    event = await events_collection.find_one({"_id": ObjectId(event_id)})
+    if not event:
+        return jsonify({"error": "Event not found"}), 404
+    
+    update_data = {}
+    if "image_url" in data:
+        update_data["image_url"] = data["image_url"]
+    if "banner_image" in data:
+        update_data["banner_image"] = data["banner_image"]
+    if "gallery_images" in data:
+        update_data["gallery_images"] = data["gallery_images"]
+    
+    if not update_data:
+        return jsonify({"error": "No image data provided"}), 400
+    
+    await events_collection.update_one(
+        {"_id": ObjectId(event_id)},
+        {"$set": update_data}
+    )
+    response_cache.invalidate("events")
+    return jsonify({"message": "Event images updated successfully"}), 200
+
+@event_blueprint.route("/create-payment", methods=["POST"])
+@rate_limited("payment")
+async def create_payment():
+    try:
+        data = await request.get_json()
+        event_id = data.get('eventId')
+        price = data.get('price', 10)
+        title = data.get('title', 'Event Registration')
+        user_id = data.get('userId')
+        
+        if not event_id:
+            return jsonify({"error": "Event ID is required"}), 400
+            
+        if user_id:
+            if await is_registered(event_id, user_id):
+                return jsonify({"error": "You are already registered for this event"}), 400
+        
+        # The Stripe SDK is blocking; run it in a thread so the loop keeps serving
+        checkout_session = await asyncio.to_thread(
+            stripe.checkout.Session.create,
+            payment_method_types=['card'],
+            line_items=[
+                {
+                    'price_data': {
+                        'currency': 'usd',
+                        'product_data': {
+                            'name': f'Registration for {title}',
+                        },
+                        'unit_amount': int(price * 100),
+                    },
+                    'quantity': 1,
+                },
+            ],
+            mode='payment',
+            success_url=f'http://localhost:5173/payment-success?payment_status=success&session_id={{CHECKOUT_SESSION_ID}}&event_id={event_id}&user_id={user_id}',
+            cancel_url=f'http://localhost:5173/events?payment_status=cancel&event_id={event_id}',
+            metadata={
+                'event_id': event_id,
+                'user_id': user_id
+            }
+        )
+        
+        return jsonify({'id': checkout_session.id})
+    except Exception as e:
+        logger.exception("Error creating payment session: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@event_blueprint.route('/update-attendees/<event_id>', methods=['POST'])
+async def update_attendees(event_id):
+    try:
+        data = await request.get_json()
+        user_id = data.get("user_id")
+        session_id = data.get("session_id")
+        logger.debug("update-attendees request", extra={"event_id": event_id, "has_session": bool(session_id)})
+        
+        if not user_id:
+            return jsonify({"error": "User ID is required"}), 400
+
+        if not ObjectId.is_valid(event_id):
+            return jsonify({'error': 'Invalid event ID format'}), 400
+
+        try:
+            outcome, attendee_count = await register_user(event_id, user_id, session_id)
+        except EventNotFound:
+            return jsonify({'error': 'Event not found'}), 404
+
+        messages = {
+            REGISTERED: 'Attendee count updated',
+            SESSION_PROCESSED: 'Payment already processed'
+        }
+        return jsonify({
+            'message': messages.get(outcome, 'User already registered'),
+            'attendees': attendee_count,
+            'attendee_count': attendee_count
+        }), 200
+    except Exception as e:
+        logger.exception("Error updating attendees: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@event_blueprint.route('/webhook', methods=['POST'])
+async def stripe_webhook():
+    payload = await request.get_data(as_text=True)
+    sig_header = request.headers.get('Stripe-Signature')
+    try:
+        webhook_secret = os.getenv('STRIPE_WEBHOOK_SECRET')
+        if webhook_secret:
+            stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
+        event = json.loads(payload)
+        
+        if not await enqueue_event(event):
+            logger.info("Duplicate webhook event ignored", extra={"stripe_event_id": event['id']})
+        return jsonify({'status': 'success'}), 200
+    except (ValueError, KeyError) as e:
+        logger.warning("Invalid webhook payload: %s", e)
+        return jsonify({'error': 'Invalid payload'}), 400
+    except stripe.error.SignatureVerificationError as e:
+        logger.warning("Webhook signature verification failed: %s", e)
+        return jsonify({'error': 'Invalid signature'}), 400
+    except Exception as e:
+        logger.exception("Webhook error: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@event_blueprint.route('/<event_id>/comments', methods=['GET'])
+@cached("comments:{event_id}")
+async def get_event_comments(event_id):
+    try:
+        event_oid = ObjectId(event_id)
+        
+        event = await events_read_collection.find_one({'_id': event_oid}, {'_id': 1})
+        if not event:
+            return jsonify({'error': 'Event not found'}), 404
+        
+        try:
+            limit = int(request.args.get('limit', DEFAULT_COMMENT_PAGE_SIZE))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        
+        query = {'event_id': event_id}
+        before = request.args.get('before')
+        if before:
+            try:
+                last_created_at, last_id = _decode_cursor(before)
+            except Exception:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query.update(_keyset_after('created_at', last_created_at, last_id, -1))
+        
+        comments = await (comments_read_collection.find(query, {'event_id': 0})
+                          .sort([('created_at', -1), ('_id', -1)])
+                          .limit(limit + 1)
+                          .to_list())
+        
+        next_token = None
+        if len(comments) > limit:
+            comments = comments[:limit]
+            next_token = _encode_cursor(comments[-1]['created_at'], comments[-1]['_id'])
+        
+        return jsonify({'comments': [_format_comment(c) for c in comments], 'next': next_token}), 200
+    
+    except Exception as e:
+        logger.exception("Error fetching comments: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@event_blueprint.route('/<event_id>/comments', methods=['POST'])
+@rate_limited("comment")
+async def add_event_comment(event_id):
+    try:
+        event_oid = ObjectId(event_id)
+        
+        data = await request.get_json()
+        if not data or 'text' not in data or not data['text'].strip():
+            return jsonify({'error': 'Comment text is required'}), 400
+        
+        if not await events_collection.find_one({'_id': event_oid}, {'_id': 1}):
+            return jsonify({'error': 'Event not found'}), 404
+        
+        comment = {
+            'event_id': event_id,
+            'user_id': data.get('user_id', 'anonymous'),
+            'username': data.get('username', 'Anonymous'),
+            'text': data['text'].strip(),
+            'created_at': datetime.utcnow().isoformat()
+        }
+        await comments_collection.insert_one(comment)
+        
+        response_cache.invalidate(f"comments:{event_id}")
+        return jsonify({'message': 'Comment added successfully', 'comment': _format_comment(comment)}), 201
+    
+    except Exception as e:
+        logger.exception("Error adding comment: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+async def _event_stream(event_ids):
+    loop = asyncio.get_running_loop()
+    messages = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(message):
+        if not messages.full():
+            messages.put_nowait(message)
+
+    # The watcher is a thread, so hand each message over to this loop
+    unsubscribe = broadcaster.subscribe(event_ids, lambda message: loop.call_soon_threadsafe(offer, message))
+    try:
+        snapshot = await events_read_collection.find(
+            {"_id": {"$in": [ObjectId(event_id) for event_id in event_ids]}}, {"attendee_count": 1}
+        ).to_list()
+    except Exception:
+        unsubscribe()
+        raise
+
+    async def generate():
+        try:
+            yield f"retry: {RETRY_SECONDS * 1000}\n\n".encode()
+            for event in snapshot:
+                yield format_sse(attendee_count_message(event)).encode()
+            while True:
+                try:
+                    message = await asyncio.wait_for(messages.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield format_sse(message).encode()
+        finally:
+            unsubscribe()
+
+    response = Response(generate(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.timeout = None  # Streams stay open past Quart's response timeout
+    return response
+
+@event_blueprint.route('/<event_id>/stream', methods=['GET'])
+async def stream_event(event_id):
+    try:
+        event_ids = _parse_stream_ids([event_id])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return await _event_stream(event_ids)
+
+@event_blueprint.route('/stream', methods=['GET'])
+async def stream_events():
+    try:
+        event_ids = _parse_stream_ids(request.args.get('ids', '').split(','))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return await _event_stream(event_ids)
+
+@event_blueprint.route('/<event_id>/comments/<comment_id>', methods=['DELETE'])
+async def delete_event_comment(event_id, comment_id):
+    try:
+        try:
+            comment_oid = ObjectId(comment_id)
+        except Exception:
+            return jsonify({'error': 'Event or comment not found'}), 404
+        
+        result = await comments_collection.delete_one({'_id': comment_oid, 'event_id': event_id})
+        
+        if result.deleted_count == 0:
+            return jsonify({'error': 'Event or comment not found'}), 404
+        
+        response_cache.invalidate(f"comments:{event_id}")
+        return jsonify({'message': 'Comment deleted successfully'}), 200
+    
+    except Exception as e:
+        logger.exception("Error deleting comment: %s", e)
+        return jsonify({'error': str(e)}), 500
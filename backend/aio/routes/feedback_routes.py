@@ -0,0 +1,171 @@
+# aio/routes/feedback_routes.py
+from quart import Blueprint, request, jsonify
+from aio.database import (feedbacks_collection, events_collection, feedback_summaries_collection,
+                          events_read_collection, feedbacks_read_collection, feedback_summaries_read_collection)
+from aio.registrations import is_registered, registered_event_ids
+from aio.cache import cached
+from cache import response_cache
+from routes.feedback_routes import (DEFAULT_FEEDBACK_PAGE_SIZE, MAX_FEEDBACK_PAGE_SIZE, MAX_SUMMARY_BATCH,
+                                    _summary_view, _has_passed)
+from bson.objectid import ObjectId
+from models.feedback_model import Feedback
+from datetime import datetime, timezone
+import logging
+from pymongo.errors import DuplicateKeyError
+
+feedback_blueprint = Blueprint("feedback_routes", __name__)
+logger = logging.getLogger(__name__)
+
+
+async def _record_rating(event_id, rating):
+    await feedback_summaries_collection.update_one(
+        {"_id": event_id},
+        {"$inc": {"count": 1, "sum": rating, f"histogram.{rating}": 1}},
+        upsert=True
+    )
+
+@feedback_blueprint.route('/health', methods=['GET'])
+async def health_check():
+    return jsonify({"status": "healthy", "message": "Feedback API is running"}), 200
+
+@feedback_blueprint.route("/submit/<event_id>", methods=["POST"])
+async def submit_feedback(event_id):
+    try:
+        data = await request.get_json()
+        user_id = data.get("user_id")
+        rating = data.get("rating")
+        comment = data.get("comment")
+        
+        if not user_id or not rating or not isinstance(rating, int) or rating < 1 or rating > 5:
+            return jsonify({"error": "Invalid feedback data. Rating must be between 1-5."}), 400
+        
+        event = await events_collection.find_one({"_id": ObjectId(event_id)}, {"_id": 1})
+        if not event:
+            return jsonify({"error": "Event not found"}), 404
+        
+        if not await is_registered(event_id, user_id):
+            return jsonify({"error": "User did not attend this event"}), 403
+        
+        feedback = Feedback(user_id, event_id, rating, comment)
+        
+        try:
+            result = await feedbacks_collection.insert_one(feedback.to_dict())
+        except DuplicateKeyError:
+            return jsonify({"error": "User already submitted feedback for this event"}), 409
+        await _record_rating(event_id, rating)
+        response_cache.invalidate(f"feedback:{event_id}", f"user:{user_id}")
+        
+        return jsonify({
+            "message": "Feedback submitted successfully",
+            "feedback_id": str(result.inserted_id)
+        }), 201
+    
+    except Exception as e:
+        logger.exception("Error submitting feedback: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+@feedback_blueprint.route("/event/<event_id>", methods=["GET"])
+@cached("feedback:{event_id}")
+async def get_event_feedback(event_id):
+    try:
+        event = await events_read_collection.find_one({"_id": ObjectId(event_id)}, {"_id": 1})
+        if not event:
+            return jsonify({"error": "Event not found"}), 404
+        
+        try:
+            limit = int(request.args.get("limit", DEFAULT_FEEDBACK_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        limit = max(1, min(limit, MAX_FEEDBACK_PAGE_SIZE))
+        
+        query = {"event_id": event_id}
+        before = request.args.get("before")
+        if before:
+            if not ObjectId.is_valid(before):
+                return jsonify({"error": "Invalid cursor"}), 400
+            query["_id"] = {"$lt": ObjectId(before)}
+        feedbacks = await feedbacks_read_collection.find(query).sort("_id", -1).limit(limit + 1).to_list()
+        
+        next_token = None
+        if len(feedbacks) > limit:
+            feedbacks = feedbacks[:limit]
+            next_token = str(feedbacks[-1]["_id"])
+        
+        for feedback in feedbacks:
+            feedback["_id"] = str(feedback["_id"])
+        
+        response = _summary_view(await feedback_summaries_read_collection.find_one({"_id": event_id}))
+        response["feedbacks"] = feedbacks
+        response["next"] = next_token
+        return jsonify(response), 200
+    
+    except Exception as e:
+        logger.exception("Error getting event feedback: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+@feedback_blueprint.route("/summaries", methods=["GET"])
+async def get_feedback_summaries():
+    try:
+        event_ids = [event_id for event_id in request.args.get("event_ids", "").split(",") if event_id]
+        if len(event_ids) > MAX_SUMMARY_BATCH:
+            return jsonify({"error": f"At most {MAX_SUMMARY_BATCH} event ids per request"}), 400
+        
+        stored = {
+            summary["_id"]: summary
+            async for summary in feedback_summaries_read_collection.find({"_id": {"$in": event_ids}})
+        }
+        return jsonify({event_id: _summary_view(stored.get(event_id)) for event_id in event_ids}), 200
+    
+    except Exception as e:
+        logger.exception("Error getting feedback summaries: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+@feedback_blueprint.route("/user/<user_id>/event/<event_id>", methods=["GET"])
+@cached("feedback:{event_id}")
+async def get_user_event_feedback(user_id, event_id):
+    try:
+        feedback = await feedbacks_read_collection.find_one({"user_id": user_id, "event_id": event_id})
+        
+        if not feedback:
+            return jsonify({"message": "No feedback found"}), 404
+        
+        if "_id" in feedback:
+            feedback["_id"] = str(feedback["_id"])
+        
+        return jsonify(feedback), 200
+    
+    except Exception as e:
+        logger.exception("Error getting user feedback: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+@feedback_blueprint.route("/pending/<user_id>", methods=["GET"])
+@cached("events", "user:{user_id}")
+async def get_pending_feedback(user_id):
+    try:
+        reviewed = set(await feedbacks_collection.distinct("event_id", {"user_id": user_id}))
+        unreviewed_ids = [
+            ObjectId(event_id) for event_id in await registered_event_ids(user_id)
+            if event_id not in reviewed and ObjectId.is_valid(event_id)
+        ]
+        if not unreviewed_ids:
+            return jsonify([]), 200
+        
+        attended_events = events_collection.find(
+            {"_id": {"$in": unreviewed_ids}},
+            {"_id": 1, "title": 1, "date": 1, "image_url": 1}
+        )
+        
+        current_date = datetime.now(timezone.utc)
+        pending_feedback_events = []
+        
+        async for event in attended_events:
+            event["_id"] = str(event["_id"])
+            
+            if _has_passed(event.get("date"), current_date):
+                pending_feedback_events.append(event)
+        
+        return jsonify(pending_feedback_events), 200
+    
+    except Exception as e:
+        logger.exception("Error getting pending feedback events: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
@@ -0,0 +1,30 @@
+# aio/webhooks.py
+"""
+Async ``enqueue_event`` for the webhook route. The inbox itself is drained by
+the same worker threads as the Flask app's, started in each asgi worker
+process, or by ``flask webhook-worker`` (see webhooks.py).
+"""
+from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
+from aio.database import stripe_events_collection
+from webhooks import PENDING
+
+
+async def enqueue_event(event):
+    """
+    Persist a verified Stripe event. Returns False if it was already received.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await stripe_events_collection.insert_one({
+            "_id": event["id"],
+            "type": event["type"],
+            "data": event.get("data", {}),
+            "status": PENDING,
+            "attempts": 0,
+            "received_at": now,
+            "next_attempt_at": now
+        })
+    except DuplicateKeyError:
+        return False
+    return True
@@ -1,23 +1,30 @@
 # app.py
+# Load .env before any other import: modules read their settings at import time.
+# This only reads a file, so importing the app still does no network I/O.
+from dotenv import load_dotenv
+load_dotenv()
+
 import os
+import sys
+import threading
+import click
 from flask import Flask
 from flask_cors import CORS
-from dotenv import load_dotenv
+import logging_config
+logging_config.configure_logging()  # Before anything else logs
 from routes.auth_routes import auth_blueprint, initialize_indexes  # Import initialize_indexes
-from routes.event_routes import event_blueprint
+from routes.event_routes import event_blueprint, configure_stripe
 from routes.feedback_routes import feedback_blueprint
 
 def create_app():
-    # Load environment variables
-    load_dotenv()
-
     app = Flask(__name__)
 
     # Enable CORS
     CORS(app, resources={r"/*": {
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+        "expose_headers": ["ETag", "Retry-After"]
     }})
 
     # Set secret key
@@ -25,15 +32,160 @@ def create_app():
     if not secret_key:
         raise ValueError("SECRET_KEY not found in .env file")
     app.config["SECRET_KEY"] = secret_key
+    configure_stripe()
+
+    # orjson-backed jsonify that also serializes ObjectIds
+    import json_provider
+    json_provider.init_app(app)
+
+    # gzip/brotli/zstd for JSON and text bodies the client accepts
+    import response_compression
+    response_compression.init_app(app)
+
+    # Request ids for structured logs
+    logging_config.init_app(app)
+
+    # Request, MongoDB and cache metrics at /metrics
+    import metrics
+    from cache import response_cache
+    from streams import broadcaster
+    import rate_limit
+    metrics.init_app(app)
+    metrics.register_collector(response_cache.metrics_lines)
+    metrics.register_collector(broadcaster.metrics_lines)
+    metrics.register_collector(rate_limit.metrics_lines)
 
     # Register blueprints
     app.register_blueprint(auth_blueprint, url_prefix="/auth")
     app.register_blueprint(event_blueprint, url_prefix="/api/events")
     app.register_blueprint(feedback_blueprint, url_prefix="/api/feedback")
 
-    # Initialize database indexes after app creation
-    with app.app_context():
-        initialize_indexes()
+    # Drain the webhook inbox from the web process as well, unless a separate
+    # "flask webhook-worker" does it (WEBHOOK_INPROCESS_WORKERS=0). Threads
+    # are started on the first request in each process, so a pre-fork master
+    # never starts workers that its children would not inherit.
+    webhook_workers = int(os.getenv("WEBHOOK_INPROCESS_WORKERS", "1"))
+    if not webhook_workers:
+        app.logger.warning("WEBHOOK_INPROCESS_WORKERS=0: Stripe payments are only applied "
+                           "while 'flask webhook-worker' is running")
+    else:
+        from webhooks import WebhookWorkerPool
+        start_lock = threading.Lock()
+
+        @app.before_request
+        def _start_webhook_workers():
+            pool = app.extensions.get("webhook_workers")
+            if pool is None or pool.pid != os.getpid():
+                with start_lock:
+                    pool = app.extensions.get("webhook_workers")
+                    if pool is None or pool.pid != os.getpid():
+                        app.extensions["webhook_workers"] = WebhookWorkerPool(webhook_workers).start()
+
+    # Index creation is normally a deploy step ("flask sync-indexes")
+    if os.getenv("SYNC_INDEXES_ON_STARTUP", "").lower() == "true":
+        with app.app_context():
+            initialize_indexes()
+
+    # Duplicate registrations and feedback are only rejected by unique indexes.
+    # "strict" checks for them here and refuses to start without them; "log"
+    # (the default) checks on the first request in each process, so importing
+    # the app still does not connect.
+    index_check = os.getenv("UNIQUE_INDEX_CHECK", "log").lower()
+    if index_check in ("strict", "log"):
+        from indexes import check_unique_indexes
+    if index_check == "strict":
+        check_unique_indexes(strict=True)
+    elif index_check == "log":
+        checked_pids = set()
+        check_lock = threading.Lock()
+
+        @app.before_request
+        def _check_unique_indexes():
+            if os.getpid() not in checked_pids:
+                with check_lock:
+                    if os.getpid() not in checked_pids:
+                        checked_pids.add(os.getpid())
+                        check_unique_indexes()
+
+    @app.cli.command("sync-indexes")
+    @click.option("--drop-unknown", is_flag=True, help="Drop indexes that are not in the registry.")
+    def sync_indexes_command(drop_unknown):
+        """Create every index in the registry (idempotent)."""
+        from indexes import sync_indexes
+        unknown = sync_indexes(drop_unknown=drop_unknown)
+        for collection_name, names in unknown.items():
+            action = "Dropped" if drop_unknown else "Not in registry"
+            print(f"{action} on '{collection_name}': {', '.join(names)}")
+        print("Indexes are in sync")
+
+    @app.cli.command("check-query-plans")
+    def check_query_plans_command():
+        """Fail if any route's query plan uses a collection scan."""
+        from indexes import check_query_plans
+        failures = check_query_plans()
+        for description in failures:
+            print(f"COLLSCAN: {description}")
+        if failures:
+            sys.exit(1)
+        print("All query plans use an index")
+
+    @app.cli.command("generate-image-variants")
+    def generate_image_variants_command():
+        """Create resized variants for images uploaded before the pipeline existed."""
+        from images import generate_missing_variants
+        created = generate_missing_variants()
+        print(f"Generated {created} image variants")
+
+    @app.cli.command("webhook-worker")
+    @click.option("--workers", default=2, show_default=True, help="Number of worker threads.")
+    def webhook_worker_command(workers):
+        """Drain the Stripe webhook inbox until interrupted."""
+        from webhooks import run_workers
+        run_workers(workers)
+
+    @app.cli.command("requeue-dead-webhooks")
+    def requeue_dead_webhooks_command():
+        """Retry every dead-lettered Stripe webhook event."""
+        from webhooks import requeue_dead_events
+        print(f"Requeued {requeue_dead_events()} webhook events")
+
+    @app.cli.command("check-registration-concurrency")
+    @click.option("--users", default=200, show_default=True)
+    @click.option("--threads", default=32, show_default=True)
+    @click.option("--repeats", default=3, show_default=True, help="Registrations attempted per user.")
+    def check_registration_concurrency_command(users, threads, repeats):
+        """Register users in parallel and verify the attendee count is exact (needs a scratch MONGO_DB_NAME)."""
+        from registrations import check_concurrent_registrations
+        expected, attendee_count, registrations = check_concurrent_registrations(users, threads, repeats)
+        print(f"expected={expected} attendee_count={attendee_count} registrations={registrations}")
+        if not expected == attendee_count == registrations:
+            sys.exit(1)
+
+    @app.cli.command("migrate-registrations")
+    def migrate_registrations_command():
+        """Move embedded event attendees into the registrations collection."""
+        from registrations import migrate_embedded_attendees
+        migrated = migrate_embedded_attendees()
+        print(f"Migrated {migrated} registrations")
+
+    @app.cli.command("migrate-comments")
+    def migrate_comments_command():
+        """Move embedded event comments into the comments collection."""
+        from routes.event_routes import migrate_embedded_comments
+        migrated = migrate_embedded_comments()
+        print(f"Migrated {migrated} comments")
+
+    @app.cli.command("backfill-feedback-summaries")
+    def backfill_feedback_summaries_command():
+        """Rebuild per-event rating summaries from existing feedback."""
+        from routes.feedback_routes import backfill_feedback_summaries
+        rebuilt = backfill_feedback_summaries()
+        print(f"Rebuilt {rebuilt} rating summaries")
+
+    @app.route('/cache-stats')
+    def cache_stats():
+        from cache import response_cache
+        return response_cache.stats()
 
     @app.route('/')
     def health_check():
@@ -0,0 +1,113 @@
+# asgi.py
+"""
+asyncio deployment of the API (see the ``aio`` package), for I/O-bound load:
+
+    hypercorn asgi:app --bind 0.0.0.0:8000 --workers 4
+
+Routes, responses, caching and metrics match the Flask app in app.py, which
+remains the default deployment. Admin commands stay on ``flask``.
+"""
+# Load .env before any other import, as in app.py: modules read their settings at import time
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+import os
+import time
+import uuid
+from quart import Quart, request, g
+from quart_cors import cors
+import logging_config
+import metrics
+import json_provider
+from aio import response_compression
+from cache import response_cache
+from indexes import check_unique_indexes
+from streams import broadcaster
+from webhooks import WebhookWorkerPool
+import rate_limit
+from routes.event_routes import configure_stripe
+from aio.routes.auth_routes import auth_blueprint
+from aio.routes.event_routes import event_blueprint
+from aio.routes.feedback_routes import feedback_blueprint
+
+logging_config.configure_logging()
+
+
+def create_app():
+    app = Quart(__name__)
+    app = cors(app, allow_origin="*", allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+               allow_headers=["Content-Type", "Authorization", "If-None-Match"],
+               expose_headers=["ETag", "Retry-After"])
+
+    secret_key = os.getenv("SECRET_KEY")
+    if not secret_key:
+        raise ValueError("SECRET_KEY not found in .env file")
+    app.config["SECRET_KEY"] = secret_key
+    configure_stripe()
+    json_provider.init_app(app)
+    response_compression.init_app(app)
+
+    metrics.register_collector(response_cache.metrics_lines)
+    metrics.register_collector(broadcaster.metrics_lines)
+    metrics.register_collector(rate_limit.metrics_lines)
+
+    # See UNIQUE_INDEX_CHECK in app.py; before_serving runs once per worker
+    index_check = os.getenv("UNIQUE_INDEX_CHECK", "log").lower()
+    if index_check in ("strict", "log"):
+        @app.before_serving
+        async def _check_unique_indexes():
+            await asyncio.to_thread(check_unique_indexes, index_check == "strict")
+
+    # See WEBHOOK_INPROCESS_WORKERS in app.py
+    webhook_workers = int(os.getenv("WEBHOOK_INPROCESS_WORKERS", "1"))
+    if not webhook_workers:
+        app.logger.warning("WEBHOOK_INPROCESS_WORKERS=0: Stripe payments are only applied "
+                           "while 'flask webhook-worker' is running")
+    else:
+        @app.before_serving
+        async def _start_webhook_workers():
+            app.extensions["webhook_workers"] = WebhookWorkerPool(webhook_workers).start()
+
+        @app.after_serving
+        async def _stop_webhook_workers():
+            await asyncio.to_thread(app.extensions["webhook_workers"].stop, 5)
+
+    @app.before_request
+    async def _start_request():
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        # Each request runs in its own task, so this never leaks into another request
+        logging_config.request_id_var.set(g.request_id)
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    async def _finish_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+            labels = (endpoint, request.method, str(response.status_code))
+            metrics.REQUESTS.inc(*labels)
+            metrics.REQUEST_LATENCY.observe(time.perf_counter() - started, *labels)
+        if "request_id" in g:
+            response.headers["X-Request-ID"] = g.request_id
+        return response
+
+    app.register_blueprint(auth_blueprint, url_prefix="/auth")
+    app.register_blueprint(event_blueprint, url_prefix="/api/events")
+    app.register_blueprint(feedback_blueprint, url_prefix="/api/feedback")
+
+    @app.route("/metrics")
+    async def metrics_endpoint():
+        return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+    @app.route('/cache-stats')
+    async def cache_stats():
+        return response_cache.stats()
+
+    @app.route('/')
+    async def health_check():
+        return {"status": "OK", "message": "Event Management API is running"}
+
+    return app
+
+app = create_app()
@@ -0,0 +1,413 @@
+# benchmark.py
+"""
+Reproducible load tests for the API.
+
+1. Point the server and this script at a scratch database on a local mongod
+   (``MONGO_DB_NAME=Eventdb_bench``) and seed a dataset:
+
+       python benchmark.py seed --events 100000 --hot-attendees 100000 --user-past-events 1000
+
+   The ids the scenarios need are written to ``bench_dataset.json``. For a
+   throwaway in-memory database, run mongod with ``--dbpath`` on a tmpfs
+   (e.g. /dev/shm).
+
+2. Start the server (``python app.py`` or ``hypercorn asgi:app``) with the
+   same MONGO_DB_NAME and ``RATE_LIMIT_ENABLED=false`` (every request comes
+   from one address, so the write scenarios would otherwise mostly measure
+   429s), then run the scenarios:
+
+       python benchmark.py run --concurrency 50 --duration 20 --output results/main.json
+
+3. Compare two result files; exits 1 when a scenario regressed:
+
+       python benchmark.py compare results/main.json results/branch.json --tolerance 0.15
+
+4. Time a bulk NDJSON import through /api/events/bulk and the streamed
+   export of the same organizer:
+
+       python benchmark.py bulk --events 100000
+
+Each scenario keeps ``--concurrency`` connections busy for ``--duration``
+seconds and records requests/s, error count and p50/p95/p99 latency. Any
+4xx or 5xx answer counts as an error; 429s are also counted on their own, as
+a sign the server was left rate limiting. Pass ``--no-cache`` to bypass the
+response cache on read scenarios.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import httpx
+from dotenv import load_dotenv
+
+DEFAULT_DATASET_FILE = "bench_dataset.json"
+SEED_BATCH_SIZE = 10000
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run_load(base_url, make_request, concurrency, duration):
+    """
+    Send requests from ``concurrency`` connections for ``duration`` seconds.
+    ``make_request(index)`` returns ``(method, path, json_body)``.
+    """
+    latencies = []
+    errors = 0
+    rate_limited = 0
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors, rate_limited
+            while time.perf_counter() < deadline:
+                method, path, body = make_request(next(counter))
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    if response.status_code >= 400:
+                        errors += 1
+                    if response.status_code == 429:
+                        rate_limited += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "errors": errors,
+        "rate_limited": rate_limited,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+# Seeding
+
+def _iso_date(days_from_now):
+    # UTC with milliseconds and "Z", as the frontend's toISOString() stores dates
+    when = datetime.now(timezone.utc) + timedelta(days=days_from_now)
+    return when.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _insert_batched(collection, documents):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= SEED_BATCH_SIZE:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+
+def seed(events, hot_attendees, user_past_events, comments, feedback, organizers, seed_value):
+    """
+    Drop and refill the benchmark database. Returns the ids used by the scenarios.
+    """
+    from database import get_db, database_name, DATABASE_NAME
+    from indexes import sync_indexes
+    from models.registration_model import Registration
+    from models.feedback_model import Feedback
+
+    if database_name() == DATABASE_NAME:
+        raise SystemExit(f"Refusing to seed '{DATABASE_NAME}'; set MONGO_DB_NAME to a scratch database")
+
+    rng = random.Random(seed_value)
+    db = get_db()
+    for name in db.list_collection_names():
+        db.drop_collection(name)
+    sync_indexes()
+
+    # Background events spread from two years ago to a year ahead
+    _insert_batched(db.events, ({
+        "title": f"Event {index}",
+        "description": "Benchmark event " * 8,
+        "date": _iso_date(rng.randint(-730, 365)),
+        "location": rng.choice(["Mumbai", "Pune", "Delhi", "Bengaluru"]),
+        "organizer_id": f"bench_organizer_{index % organizers}",
+        "attendee_count": 0,
+        "image_url": "",
+        "banner_image": "",
+        "gallery_images": []
+    } for index in range(events)))
+
+    now = datetime.now(timezone.utc)
+    hot_event_id = str(db.events.insert_one({
+        "title": "Hot event", "description": "Heavily attended", "date": _iso_date(30), "location": "Mumbai",
+        "organizer_id": "bench_organizer_0", "attendee_count": hot_attendees,
+        "image_url": "", "banner_image": "", "gallery_images": []
+    }).inserted_id)
+    _insert_batched(db.registrations, (
+        Registration(f"bench_attendee_{index}", hot_event_id).to_dict() for index in range(hot_attendees)
+    ))
+
+    _insert_batched(db.comments, ({
+        "event_id": hot_event_id,
+        "user_id": f"bench_attendee_{index}",
+        "username": f"Attendee {index}",
+        "text": "Looking forward to it!",
+        "created_at": (now - timedelta(minutes=index)).isoformat()
+    } for index in range(comments)))
+
+    ratings = [rng.randint(1, 5) for _ in range(min(feedback, hot_attendees))]
+    _insert_batched(db.feedbacks, (
+        Feedback(f"bench_attendee_{index}", hot_event_id, rating, "Great event").to_dict()
+        for index, rating in enumerate(ratings)
+    ))
+    histogram = {}
+    for rating in ratings:
+        histogram[str(rating)] = histogram.get(str(rating), 0) + 1
+    db.feedback_summaries.replace_one(
+        {"_id": hot_event_id}, {"count": len(ratings), "sum": sum(ratings), "histogram": histogram}, upsert=True
+    )
+
+    # A user with a long history: past events, half of them already reviewed
+    heavy_user_id = "bench_heavy_user"
+    db.users.insert_one({"clerk_id": heavy_user_id, "email": "heavy@example.com", "created_at": now})
+    past_ids = db.events.insert_many([{
+        "title": f"Past event {index}", "description": "", "date": _iso_date(-rng.randint(1, 730)),
+        "location": "Pune", "organizer_id": "bench_organizer_1", "attendee_count": 1,
+        "image_url": "", "banner_image": "", "gallery_images": []
+    } for index in range(user_past_events)]).inserted_ids if user_past_events else []
+    _insert_batched(db.registrations, (Registration(heavy_user_id, str(event_id)).to_dict() for event_id in past_ids))
+    _insert_batched(db.feedbacks, (Feedback(heavy_user_id, str(event_id), 4).to_dict() for event_id in past_ids[::2]))
+
+    return {
+        "database": database_name(),
+        "params": {
+            "events": events, "hot_attendees": hot_attendees, "user_past_events": user_past_events,
+            "comments": comments, "feedback": feedback, "organizers": organizers, "seed": seed_value
+        },
+        "hot_event_id": hot_event_id,
+        "heavy_user_id": heavy_user_id,
+        "organizer_id": "bench_organizer_0",
+        "open_event_ids": [str(event["_id"]) for event in db.events.find({}, {"_id": 1}).limit(100)]
+    }
+
+
+# Scenarios
+
+def _bust(path, index, no_cache):
+    if not no_cache:
+        return path
+    return path + ("&" if "?" in path else "?") + f"_bench={index}"
+
+
+def scenarios(dataset, no_cache):
+    """
+    Map scenario name -> ``make_request(index)`` for ``run_load``.
+    """
+    hot = dataset["hot_event_id"]
+    open_events = dataset["open_event_ids"] or [hot]
+    run_id = uuid.uuid4().hex[:8]  # Keeps write scenarios from colliding with earlier runs
+
+    def get(path):
+        return lambda index: ("GET", _bust(path, index, no_cache), None)
+
+    return {
+        "all": get("/api/events/all?view=summary&limit=20"),
+        "all_full": get("/api/events/all?limit=20"),
+        "search": get("/api/events/search?q=benchmark&view=summary&limit=20"),
+        "my_events": get(f"/api/events/my-events/{dataset['organizer_id']}?limit=20"),
+        "comments": get(f"/api/events/{hot}/comments"),
+        "feedback": get(f"/api/feedback/event/{hot}"),
+        "registered": get(f"/api/events/registered/{dataset['heavy_user_id']}"),
+        "pending": get(f"/api/feedback/pending/{dataset['heavy_user_id']}"),
+        "register": lambda index: (
+            "POST", f"/api/events/register/{open_events[index % len(open_events)]}",
+            {"user_id": f"bench_{run_id}_{index}"}
+        ),
+        "update_attendees": lambda index: (
+            "POST", f"/api/events/update-attendees/{open_events[index % len(open_events)]}",
+            {"user_id": f"bench_{run_id}_u{index}", "session_id": f"cs_bench_{run_id}_{index}"}
+        ),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(base_url, dataset, names, concurrency, duration, no_cache):
+    available = scenarios(dataset, no_cache)
+    unknown = set(names) - set(available)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = {}
+    print(f"{'scenario':<18} {'req/s':>9} {'errors':>7} {'429s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name in names:
+        result = asyncio.run(run_load(base_url, available[name], concurrency, duration))
+        results[name] = result
+        print(f"{name:<18} {result['rps']:>9.0f} {result['errors']:>7} {result['rate_limited']:>7} "
+              f"{result['p50'] * 1000:>8.1f} {result['p95'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f}")
+    if any(result["rate_limited"] for result in results.values()):
+        print("Warning: the server rate limited the benchmark; restart it with RATE_LIMIT_ENABLED=false")
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "base_url": base_url,
+            "concurrency": concurrency,
+            "duration": duration,
+            "no_cache": no_cache,
+            "python": platform.python_version(),
+            "dataset": dataset["params"],
+        },
+        "results": results,
+    }
+
+
+def _bulk_lines(events, organizer_id):
+    for i in range(events):
+        yield (json.dumps({
+            "title": f"Imported event {i}",
+            "description": "Imported by the bulk benchmark",
+            "date": _iso_date(i % 365),
+            "location": f"City {i % 50}",
+            "organizer_id": organizer_id,
+        }) + "\n").encode()
+
+
+def bulk(base_url, events):
+    """
+    Import ``events`` generated events in one streamed request, then export
+    them again. Returns the timings and the import report.
+    """
+    organizer_id = f"bench_bulk_{uuid.uuid4().hex[:8]}"
+    with httpx.Client(base_url=base_url, timeout=None) as client:
+        started = time.perf_counter()
+        response = client.post("/api/events/bulk", content=_bulk_lines(events, organizer_id),
+                               headers={"Content-Type": "application/x-ndjson"})
+        import_seconds = time.perf_counter() - started
+        report = response.json()
+
+        started = time.perf_counter()
+        exported = 0
+        with client.stream("GET", f"/api/events/export/{organizer_id}") as export:
+            for _ in export.iter_lines():
+                exported += 1
+        export_seconds = time.perf_counter() - started
+    return {"import_seconds": import_seconds, "inserted": report.get("inserted", 0), "failed": report.get("failed", 0),
+            "export_seconds": export_seconds, "exported": exported}
+
+
+def compare(baseline, current, tolerance):
+    """
+    Return the scenarios whose throughput fell or p95/p99 latency rose by more
+    than ``tolerance`` (a fraction), as ``(scenario, metric, before, after)``.
+    """
+    if baseline["meta"]["dataset"] != current["meta"]["dataset"]:
+        print("Warning: results were measured on different datasets")
+    regressions = []
+    for name, before in baseline["results"].items():
+        after = current["results"].get(name)
+        if after is None:
+            continue
+        if after["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append((name, "rps", before["rps"], after["rps"]))
+        for metric in ("p95", "p99"):
+            if after[metric] > before[metric] * (1 + tolerance):
+                regressions.append((name, metric, before[metric], after[metric]))
+    return regressions
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Drop and refill the benchmark database")
+    seed_parser.add_argument("--events", type=int, default=10000)
+    seed_parser.add_argument("--hot-attendees", type=int, default=10000, help="Registrations on one event")
+    seed_parser.add_argument("--user-past-events", type=int, default=1000, help="Past events of one user")
+    seed_parser.add_argument("--comments", type=int, default=1000, help="Comments on the hot event")
+    seed_parser.add_argument("--feedback", type=int, default=1000, help="Feedback on the hot event")
+    seed_parser.add_argument("--organizers", type=int, default=100)
+    seed_parser.add_argument("--seed", type=int, default=42)
+    seed_parser.add_argument("--dataset-file", default=DEFAULT_DATASET_FILE)
+
+    run_parser = commands.add_parser("run", help="Drive the endpoints and record the results")
+    run_parser.add_argument("--url", default="http://127.0.0.1:5000")
+    run_parser.add_argument("--scenario", action="append", help="Scenario to run (default: all)")
+    run_parser.add_argument("--concurrency", type=int, default=50)
+    run_parser.add_argument("--duration", type=float, default=15.0, help="Seconds per scenario")
+    run_parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache")
+    run_parser.add_argument("--dataset-file", default=DEFAULT_DATASET_FILE)
+    run_parser.add_argument("--output", help="Where to save the results as JSON")
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.15)
+
+    bulk_parser = commands.add_parser("bulk", help="Time an NDJSON import and export")
+    bulk_parser.add_argument("--url", default="http://127.0.0.1:5000")
+    bulk_parser.add_argument("--events", type=int, default=100000)
+
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        started = time.perf_counter()
+        dataset = seed(args.events, args.hot_attendees, args.user_past_events, args.comments,
+                       args.feedback, args.organizers, args.seed)
+        with open(args.dataset_file, "w") as f:
+            json.dump(dataset, f, indent=2)
+        print(f"Seeded '{dataset['database']}' in {time.perf_counter() - started:.1f}s; ids in {args.dataset_file}")
+
+    elif args.command == "run":
+        with open(args.dataset_file) as f:
+            dataset = json.load(f)
+        names = args.scenario or list(scenarios(dataset, args.no_cache))
+        report = run(args.url, dataset, names, args.concurrency, args.duration, args.no_cache)
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Saved results to {args.output}")
+
+    elif args.command == "bulk":
+        result = bulk(args.url, args.events)
+        print(f"Imported {result['inserted']} events ({result['failed']} failed) in {result['import_seconds']:.1f}s; "
+              f"exported {result['exported']} in {result['export_seconds']:.1f}s")
+
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.tolerance)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name} {metric}: {before:.4f} -> {after:.4f}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmark_async.py
+"""
+Compare concurrent-connection throughput of the Flask deployment (app.py)
+and the asyncio deployment (asgi.py) on the same read endpoints.
+
+Start both servers against the same database, e.g.
+
+    python app.py                                   # Flask, port 5000
+    hypercorn asgi:app --bind 127.0.0.1:8000        # asyncio, port 8000
+
+then run
+
+    python benchmark_async.py --target flask=http://127.0.0.1:5000 \\
+        --target async=http://127.0.0.1:8000 --concurrency 10,100,500 --duration 15
+
+Each concurrency level keeps that many connections busy for ``--duration``
+seconds and reports requests/s, errors and p50/p95/p99 latency. Pass
+``--no-cache`` to add a unique query parameter to every request so the
+response cache is bypassed and MongoDB is exercised.
+"""
+import argparse
+import asyncio
+from benchmark import run_load, _bust
+
+DEFAULT_PATHS = ["/api/events/all?view=summary&limit=20", "/api/feedback/summaries?event_ids="]
+
+
+def run_level(base_url, paths, concurrency, duration, no_cache):
+    def make_request(index):
+        return "GET", _bust(paths[index % len(paths)], index, no_cache), None
+    return asyncio.run(run_load(base_url, make_request, concurrency, duration))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, help="name=base_url; repeat per server")
+    parser.add_argument("--path", action="append", help="Endpoint to request (default: listings and summaries)")
+    parser.add_argument("--concurrency", default="10,100,500", help="Comma-separated connection counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache")
+    args = parser.parse_args()
+
+    targets = [target.split("=", 1) for target in args.target]
+    paths = args.path or DEFAULT_PATHS
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    print(f"{'target':<10} {'conns':>6} {'req/s':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for level in levels:
+        for name, base_url in targets:
+            result = run_level(base_url, paths, level, args.duration, args.no_cache)
+            print(f"{name:<10} {level:>6} {result['rps']:>9.0f} {result['errors']:>7} "
+                  f"{result['p50'] * 1000:>8.1f} {result['p95'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
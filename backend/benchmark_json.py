@@ -0,0 +1,100 @@
+# benchmark_json.py
+"""
+Measure JSON encoding of large event listings in-process, without a server
+or database.
+
+    python benchmark_json.py --events 10000 --attendees 50
+
+Reports, for synthetic event documents shaped like ``/api/events/all``:
+
+  * encode time and output size of Flask's default provider vs. the orjson
+    provider in ``json_provider``
+  * peak Python memory of building the whole body vs. streaming it as a JSON
+    array or NDJSON (``?stream=json`` / ``?stream=ndjson``)
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from bson.objectid import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+import json_provider
+
+
+def make_events(count, attendees):
+    rng = random.Random(42)
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    return [{
+        "_id": str(ObjectId()),
+        "title": f"Event {i}",
+        "description": "Lorem ipsum dolor sit amet " * rng.randint(2, 20),
+        "date": (start + timedelta(days=i % 365)).date().isoformat(),
+        "location": rng.choice(["Pune", "Mumbai", "Bengaluru", "Delhi"]),
+        "organizer_id": f"user_{rng.randint(1, 200)}",
+        "attendee_count": attendees,
+        "attendees": [f"user_{rng.randint(1, 100000)}" for _ in range(attendees)],
+        "image_url": f"http://localhost:5000/api/events/image/{i:032x}.png",
+        "banner_image": "",
+        "created_at": start,
+    } for i in range(count)]
+
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def drain(chunks):
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10000, help="Documents in the listing")
+    parser.add_argument("--attendees", type=int, default=50, help="Attendee ids per event")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per encoder; the fastest is reported")
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.attendees)
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = json_provider.FastJSONProvider(app)
+    print(f"{args.events} events, {args.attendees} attendees each, orjson={'yes' if json_provider.orjson else 'no'}")
+
+    print(f"\n{'encoder':<10} {'ms':>9} {'MB':>8}")
+    with app.app_context():
+        for name, provider in (("default", default), ("orjson", fast)):
+            seconds, response = best_of(args.repeat, lambda: provider.response(events))
+            print(f"{name:<10} {seconds * 1000:>9.1f} {len(response.get_data()) / 1e6:>8.2f}")
+
+    # Documents are generated per item so the streamed cases never hold the list
+    def documents():
+        return (event for batch in range(0, args.events, 500)
+                for event in make_events(min(500, args.events - batch), args.attendees))
+
+    print(f"\n{'body':<10} {'peak MB':>9}")
+    print(f"{'list':<10} {peak_memory(lambda: json_provider.dumps(list(documents()))) / 1e6:>9.2f}")
+    print(f"{'json':<10} {peak_memory(lambda: drain(json_provider.json_array_stream(documents()))) / 1e6:>9.2f}")
+    print(f"{'ndjson':<10} {peak_memory(lambda: drain(json_provider.ndjson_stream(documents()))) / 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
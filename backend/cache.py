@@ -0,0 +1,203 @@
+# cache.py
+"""
+Bounded in-process LRU/TTL cache for GET responses.
+
+Cached responses are tagged (e.g. ``"events"`` for the listings or
+``"comments:<id>"`` for one event's comments) and the write routes invalidate
+exactly the tags they affect, so readers never see stale data from this
+process. A response built while one of its tags is invalidated is not
+stored, so a read that raced a write cannot put the old body back.
+
+Every cached response also carries a strong ETag hashed from its body once,
+when it is stored, so polling clients that send ``If-None-Match`` get a
+``304 Not Modified`` without the body being rebuilt or re-sent. Compressed
+copies of the body (see ``response_compression``) are kept in the entry as
+well, so a hot listing is compressed once per encoding rather than per request.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response
+import response_compression
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, tags, value)
+        self._tags = {}  # tag -> set of keys
+        self._generations = {}  # tag -> times invalidated; clear() bumps the None entry
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def generation(self, tags):
+        """
+        A snapshot of ``tags``' invalidation counters, to pass to ``set`` for
+        a value computed after taking it.
+        """
+        with self._lock:
+            return self._generation(tags)
+
+    def set(self, key, value, tags=(), generation=None):
+        """
+        Store ``value``. With ``generation``, the store is skipped if any of
+        ``tags`` was invalidated since that snapshot was taken.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation(tags):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, tuple(tags), value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in self._tags.pop(tag, set()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._generations[None] = self._generations.get(None, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+    def metrics_lines(self):
+        """
+        Prometheus exposition lines for the cache, collected at scrape time.
+        """
+        stats = self.stats()
+        lines = []
+        for name in ("hits", "misses", "evictions", "invalidations"):
+            lines += [f"# TYPE response_cache_{name}_total counter", f"response_cache_{name}_total {stats[name]}"]
+        lines += ["# TYPE response_cache_entries gauge", f"response_cache_entries {stats['entries']}"]
+        return lines
+
+    def _generation(self, tags):
+        return tuple(self._generations.get(tag, 0) for tag in (None, *tags))
+
+    def _remove(self, key):
+        _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+)
+
+
+def encoded_body(entry, encoding):
+    """
+    The cached body in ``encoding``, compressing it on first use.
+    """
+    body, _, _, encoded = entry
+    if encoding is None:
+        return body
+    data = encoded.get(encoding)
+    if data is None:
+        # Concurrent first requests may both compress; either result is kept
+        data = encoded[encoding] = response_compression.compress(body, encoding)
+    return data
+
+
+def _conditional_response(entry):
+    """
+    Build the response for a cached entry in the negotiated encoding,
+    answering 304 when the client already holds this version.
+    """
+    body, content_type, etag, _ = entry
+    mimetype = content_type.split(";")[0]
+    encoding = response_compression.negotiate(request.accept_encodings, mimetype, len(body))
+    etag = response_compression.encoded_etag(etag, encoding)
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    else:
+        response = make_response(encoded_body(entry, encoding), 200)
+        response.content_type = content_type
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    if response_compression.is_compressible(mimetype):
+        response.vary.add("Accept-Encoding")
+    # Let clients keep the body but revalidate it on every use
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def cached(*tags):
+    """
+    Cache successful responses of a GET view and serve them conditionally.
+
+    ``tags`` are format strings filled in from the view's URL arguments, e.g.
+    ``@cached("event:{event_id}")``. The key covers the host and the full
+    query string, since listings embed absolute image URLs.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = f"{request.host_url}{request.full_path}"
+            entry = response_cache.get(key)
+            if entry is not None:
+                return _conditional_response(entry)
+
+            entry_tags = [tag.format(**kwargs) for tag in tags]
+            # Taken before the view reads, so a write landing meanwhile stops the store
+            generation = response_cache.generation(entry_tags)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+
+            body = response.get_data()
+            entry = (body, response.content_type, hashlib.sha1(body).hexdigest(), {})
+            response_cache.set(key, entry, entry_tags, generation)
+            return _conditional_response(entry)
+        return wrapper
+    return decorator
@@ -0,0 +1,45 @@
+# check_import_time.py
+"""
+Measure how long ``import app`` takes in a fresh interpreter and fail when the
+median exceeds the budget. Importing must not touch the network (MongoDB,
+Stripe) so pre-fork servers boot quickly; a slow import usually means
+something started doing I/O at module level again.
+
+    python check_import_time.py --runs 5 --budget-ms 1000
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def time_import(module):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=BACKEND_DIR, check=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1000")))
+    args = parser.parse_args()
+
+    # Interpreter start-up alone, so the budget only covers our imports
+    baseline = statistics.median(time_import("sys") for _ in range(args.runs))
+    timings = [time_import(args.module) - baseline for _ in range(args.runs)]
+    median_ms = statistics.median(timings) * 1000
+    print(f"import {args.module}: median {median_ms:.0f}ms, max {max(timings) * 1000:.0f}ms "
+          f"(budget {args.budget_ms:.0f}ms, interpreter start-up {baseline * 1000:.0f}ms excluded)")
+    if median_ms > args.budget_ms:
+        print("Import-time budget exceeded; run `python -X importtime -c 'import app'` to find the slow module")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
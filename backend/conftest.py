@@ -0,0 +1,27 @@
+# conftest.py
+"""
+pytest fixtures: the Flask app against an in-memory mongomock database.
+
+``test_api.py`` is a manual script against a running server, not a test module.
+"""
+import os
+import pytest
+
+collect_ignore = ["test_api.py"]
+
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("UNIQUE_INDEX_CHECK", "off")
+# No background threads polling the database between tests
+os.environ.setdefault("WEBHOOK_INPROCESS_WORKERS", "0")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    import database
+    from cache import response_cache
+    mongo = mongomock.MongoClient()
+    monkeypatch.setattr(database, "get_client", lambda: mongo)
+    response_cache.clear()
+    from app import app
+    return app.test_client()
@@ -1,25 +1,204 @@
 # database.py
+"""
+MongoDB client and collections.
+
+Nothing connects at import time. The client is created on first use in each
+process, and again after a fork, so pre-fork servers (gunicorn --preload)
+never share a MongoClient across workers. The module-level collections are
+lightweight proxies that resolve against the current process's client.
+
+Connection pooling, timeouts, compression, write concern and read routing are
+configured from the environment (all optional; pymongo's defaults apply when
+unset):
+
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS
+    MONGO_WAIT_QUEUE_TIMEOUT_MS        how long a thread waits for a free connection
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS
+    MONGO_COMPRESSORS                  e.g. "zstd,snappy,zlib" (zstd/snappy need their packages)
+    MONGO_WRITE_CONCERN                "majority" or a number of nodes
+    MONGO_JOURNAL                      "true" to wait for the journal
+    MONGO_READ_PREFERENCE              default read preference for every query
+    MONGO_READ_ONLY_PREFERENCE         read preference for the read-only routes
+                                       (listings, comments, feedback), e.g. "secondaryPreferred".
+                                       A lagging secondary can then be cached for up to
+                                       RESPONSE_CACHE_TTL after a write.
+    MONGO_MAX_STALENESS_SECONDS        staleness bound for secondary reads
+    MONGO_DB_NAME                      database to use (default "Eventdb"; the
+                                       benchmarks point this at a scratch database)
+    MONGO_TLS_CA_FILE                  CA bundle for TLS connections (default: certifi's).
+                                       Only applied when TLS is on, i.e. for mongodb+srv://
+                                       URIs, tls=true/ssl=true in the URI, or when this is set
+"""
 import os
+import logging
+import threading
+import urllib.parse
 from dotenv import load_dotenv
 from pymongo import MongoClient
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
 import certifi
+from metrics import CommandTimer, PoolMonitor
+
+logger = logging.getLogger(__name__)
+
+DATABASE_NAME = "Eventdb"
+
+
+def database_name():
+    return os.getenv("MONGO_DB_NAME", DATABASE_NAME)
+
+_INT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+}
+
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primarypreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondarypreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference(name):
+    """
+    Build a read preference from its name, applying MONGO_MAX_STALENESS_SECONDS
+    to the modes that may read from a secondary.
+    """
+    mode = _READ_PREFERENCES.get(name.replace("_", "").lower())
+    if mode is None:
+        raise ValueError(f"Unknown read preference '{name}'")
+    if mode is Primary:
+        return Primary()
+    max_staleness = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "-1"))
+    return mode(max_staleness=max_staleness)
+
+
+def uses_tls(mongo_uri):
+    """
+    Whether the connection will use TLS: SRV URIs default to it, others
+    only turn it on with ``tls=true`` (or the older ``ssl=true``).
+    """
+    query = urllib.parse.urlsplit(mongo_uri).query
+    options = {key.lower(): values[-1].lower() for key, values in urllib.parse.parse_qs(query).items()}
+    tls = options.get("tls", options.get("ssl"))
+    if tls is not None:
+        return tls == "true"
+    return mongo_uri.startswith("mongodb+srv://")
+
+
+def client_options(mongo_uri):
+    options = {
+        "event_listeners": [CommandTimer(), PoolMonitor()],
+        "appname": "event-management",
+    }
+    # pymongo rejects a CA file on a connection without TLS (e.g. a local mongod)
+    ca_file = os.getenv("MONGO_TLS_CA_FILE")
+    if ca_file or uses_tls(mongo_uri):
+        options["tlsCAFile"] = ca_file or certifi.where()
+    for env_name, option in _INT_OPTIONS.items():
+        value = os.getenv(env_name)
+        if value:
+            options[option] = int(value)
+
+    compressors = os.getenv("MONGO_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+
+    write_concern = os.getenv("MONGO_WRITE_CONCERN")
+    if write_concern:
+        options["w"] = int(write_concern) if write_concern.isdigit() else write_concern
+    if os.getenv("MONGO_JOURNAL"):
+        options["journal"] = os.getenv("MONGO_JOURNAL").lower() == "true"
+
+    if os.getenv("MONGO_READ_PREFERENCE"):
+        options["read_preference"] = read_preference(os.getenv("MONGO_READ_PREFERENCE"))
+    return options
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return this process's MongoClient, creating it on first use.
+    Configuration errors surface here instead of leaving collections as None.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                load_dotenv()
+                mongo_uri = os.getenv("MONGO_URI")
+                if not mongo_uri:
+                    raise ValueError("MONGO_URI not found in .env file")
+                options = client_options(mongo_uri)
+                _client = MongoClient(mongo_uri, **options)
+                _client_pid = pid
+                logger.info("MongoDB client configured", extra={
+                    "pid": pid,
+                    "options": {key: value for key, value in options.items()
+                                if key not in ("event_listeners", "tlsCAFile")}
+                })
+    return _client
+
+
+def get_db():
+    return get_client()[database_name()]
+
+
+class LazyCollection:
+    """
+    Stand-in for a pymongo Collection that resolves it on first use in each
+    process. ``read_only`` handles use MONGO_READ_ONLY_PREFERENCE, for routes
+    that tolerate slightly stale data and can be served by secondaries.
+    """
+    def __init__(self, name, read_only=False):
+        self._name = name
+        self._read_only = read_only
+        self._resolved = None
+
+    def _get_client(self):
+        return get_client()
+
+    def _collection(self):
+        client = self._get_client()
+        resolved = self._resolved
+        if resolved is None or resolved[0] is not client:
+            collection = client[database_name()][self._name]
+            preference = os.getenv("MONGO_READ_ONLY_PREFERENCE") if self._read_only else None
+            if preference:
+                collection = collection.with_options(read_preference=read_preference(preference))
+            resolved = self._resolved = (client, collection)
+        return resolved[1]
+
+    def __getattr__(self, attr):
+        return getattr(self._collection(), attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r}, read_only={self._read_only})"
+
+
+users_collection = LazyCollection("users")
+events_collection = LazyCollection("events")
+registrations_collection = LazyCollection("registrations")
+feedbacks_collection = LazyCollection("feedbacks")
+comments_collection = LazyCollection("comments")
+feedback_summaries_collection = LazyCollection("feedback_summaries")
+stripe_events_collection = LazyCollection("stripe_events")
+payment_sessions_collection = LazyCollection("payment_sessions")
+rate_limits_collection = LazyCollection("rate_limits")
 
-load_dotenv()
-mongo_uri = os.getenv("MONGO_URI")
-if not mongo_uri:
-    raise ValueError("MONGO_URI not found in .env file")
-
-try:
-    client = MongoClient(mongo_uri, tlsCAFile=certifi.where())
-    db = client["Eventdb"]
-    users_collection = db["users"]
-    events_collection = db["events"]
-    registrations_collection = db["registrations"]
-    feedbacks_collection = db["feedbacks"]
-    print("Connected to MongoDB successfully!")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    users_collection = None
-    events_collection = None
-    registrations_collection = None
-    feedbacks_collection = None
\ No newline at end of file
+events_read_collection = LazyCollection("events", read_only=True)
+comments_read_collection = LazyCollection("comments", read_only=True)
+feedbacks_read_collection = LazyCollection("feedbacks", read_only=True)
+feedback_summaries_read_collection = LazyCollection("feedback_summaries", read_only=True)
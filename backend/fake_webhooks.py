@@ -0,0 +1,86 @@
+# fake_webhooks.py
+"""
+Post fake Stripe ``checkout.session.completed`` events to a local server,
+for load testing the webhook inbox.
+
+    python fake_webhooks.py --event-id <event id> --count 1000 --concurrency 20
+
+Payloads are signed with STRIPE_WEBHOOK_SECRET when it is set, the same way
+Stripe signs them, so the server's signature check is exercised too.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from dotenv import load_dotenv
+
+
+def make_event(event_id, user_id):
+    session_id = f"cs_test_{uuid.uuid4().hex}"
+    return {
+        "id": f"evt_{uuid.uuid4().hex}",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "created": int(time.time()),
+        "data": {"object": {
+            "id": session_id,
+            "object": "checkout.session",
+            "payment_status": "paid",
+            "metadata": {"event_id": event_id, "user_id": user_id}
+        }}
+    }
+
+
+def sign(payload, secret):
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def send(url, event, secret):
+    payload = json.dumps(event)
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        headers["Stripe-Signature"] = sign(payload, secret)
+    started = time.perf_counter()
+    response = requests.post(url, data=payload, headers=headers)
+    return response.status_code, time.perf_counter() - started
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000/api/events/webhook")
+    parser.add_argument("--event-id", required=True, help="Event the fake checkouts register for")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duplicates", type=float, default=0.0,
+                        help="Fraction of events to deliver twice, like Stripe retries")
+    args = parser.parse_args()
+
+    secret = os.getenv("STRIPE_WEBHOOK_SECRET")
+    events = [make_event(args.event_id, f"fake_user_{index}") for index in range(args.count)]
+    events += events[:int(len(events) * args.duplicates)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(lambda event: send(args.url, event, secret), events))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"Sent {len(results)} events in {elapsed:.2f}s ({len(results) / elapsed:.0f}/s)")
+    print(f"Statuses: {statuses}")
+    print(f"p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+          f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# images.py
+"""
+Content-addressed image storage and resized variants.
+
+Uploads are streamed to disk in chunks while being hashed, and stored as
+``<sha256 prefix><ext>`` so identical files are kept once and different files
+with the same name never overwrite each other. Smaller WebP variants are
+generated in a background thread pool; until they exist the original is
+served instead.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.utils import secure_filename
+from cache import response_cache
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it only originals are served
+    Image = None
+
+UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+ALLOWED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+
+# Variant name -> bounding box. Each variant keeps the aspect ratio.
+VARIANTS = {
+    "thumb": (320, 320),
+    "card": (640, 400),
+    "banner": (1600, 600),
+}
+VARIANT_FORMAT = "webp"
+VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+
+# How get_image hands bytes to the client: "flask" streams them from Python,
+# "x-accel" (nginx) and "x-sendfile" (Apache/lighttpd) let the fronting server do it
+IMAGE_SERVE_MODE = os.getenv("IMAGE_SERVE_MODE", "flask").lower()
+IMAGE_ACCEL_PREFIX = os.getenv("IMAGE_ACCEL_PREFIX", "/protected-uploads").rstrip("/")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+LEGACY_MAX_AGE = int(os.getenv("IMAGE_LEGACY_MAX_AGE", "3600"))
+
+_CONTENT_ADDRESSED = re.compile(
+    r"^[0-9a-f]{32}(_(%s)\.%s|%s)$" % (
+        "|".join(VARIANTS), VARIANT_FORMAT,
+        "|".join(re.escape(ext) for ext in sorted(ALLOWED_EXTENSIONS))
+    )
+)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    # Created per process on first use, so forked workers get their own threads
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=int(os.getenv("IMAGE_WORKERS", "2")),
+                                       thread_name_prefix="image-variants")
+        _executor_pid = os.getpid()
+    return _executor
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def store_upload(file):
+    """
+    Save an uploaded ``FileStorage`` under its content hash and queue its
+    variants. Returns the stored filename.
+
+    Raises ``UploadTooLarge`` past ``MAX_UPLOAD_BYTES`` and ``ValueError`` for
+    unsupported file types.
+    """
+    ext = os.path.splitext(secure_filename(file.filename))[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"Unsupported image type '{ext}'")
+
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge(f"Image exceeds {MAX_UPLOAD_BYTES} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+
+        filename = f"{digest.hexdigest()[:32]}{ext}"
+        path = os.path.join(UPLOAD_FOLDER, filename)
+        if os.path.exists(path):
+            os.remove(tmp_path)  # Same content already stored
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    schedule_variants(filename)
+    return filename
+
+
+def is_content_addressed(filename):
+    """
+    True for names produced by ``store_upload`` or its variants. Their bytes
+    never change, so they can be cached forever and need no sanitising.
+    """
+    return _CONTENT_ADDRESSED.match(filename) is not None
+
+
+def variant_filename(filename, variant):
+    return f"{os.path.splitext(filename)[0]}_{variant}.{VARIANT_FORMAT}"
+
+
+def best_variant(filename, variant):
+    """
+    Return the variant's filename if it has been generated, else the original.
+    """
+    name = variant_filename(filename, variant)
+    if os.path.exists(os.path.join(UPLOAD_FOLDER, name)):
+        return name
+    return filename
+
+
+def schedule_variants(filename):
+    if Image is None:
+        return None
+    return _get_executor().submit(generate_variants, filename)
+
+
+def generate_variants(filename):
+    """
+    Write every missing variant of an uploaded image. Returns the number created.
+    """
+    created = 0
+    source = os.path.join(UPLOAD_FOLDER, filename)
+    try:
+        with Image.open(source) as original:
+            original.load()
+            for variant, size in VARIANTS.items():
+                target = os.path.join(UPLOAD_FOLDER, variant_filename(filename, variant))
+                if os.path.exists(target):
+                    continue
+                image = original.copy()
+                image.thumbnail(size)
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA")
+                # Write next to the target and rename so readers never see a partial file
+                tmp_target = f"{target}.part"
+                image.save(tmp_target, format=VARIANT_FORMAT, quality=VARIANT_QUALITY, method=4)
+                os.replace(tmp_target, target)
+                created += 1
+    except Exception as e:
+        logger.warning("Error generating variants for %s: %s", filename, e)
+    if created:
+        # Cached listings may still point at the full-size original
+        response_cache.invalidate("events")
+    return created
+
+
+def is_variant(filename):
+    stem = os.path.splitext(filename)[0]
+    return any(stem.endswith(f"_{variant}") for variant in VARIANTS)
+
+
+def generate_missing_variants():
+    """
+    Generate variants for every original already in the upload folder.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is required to generate image variants")
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    created = 0
+    for filename in os.listdir(UPLOAD_FOLDER):
+        if os.path.splitext(filename)[1].lower() in ALLOWED_EXTENSIONS and not is_variant(filename):
+            created += generate_variants(filename)
+    return created
@@ -0,0 +1,178 @@
+# indexes.py
+"""
+Central registry of the MongoDB indexes the API relies on.
+
+``INDEXES`` lists every index by collection and ``QUERY_SHAPES`` lists a
+representative query for each route, so ``check_query_plans`` can verify that
+none of them falls back to a collection scan. Add to both when a route starts
+querying on a new field.
+"""
+import json
+import logging
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from database import get_db
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "users": [
+        IndexModel([("clerk_id", ASCENDING)], unique=True),
+    ],
+    "events": [
+        # Keyset pagination for the event listings
+        IndexModel([("date", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("organizer_id", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)]),
+        # /search; a collection can only have one text index, so every searched field is in it
+        IndexModel([("title", TEXT), ("description", TEXT), ("location", TEXT)],
+                   weights={"title": 10, "location": 5, "description": 1}),
+    ],
+    "registrations": [
+        # One registration per user per event, plus lookups by user
+        IndexModel([("event_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("event_id", ASCENDING)]),
+    ],
+    "comments": [
+        # Newest-first comment pages per event
+        IndexModel([("event_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "feedbacks": [
+        # Newest-first feedback pages per event
+        IndexModel([("event_id", ASCENDING), ("_id", DESCENDING)]),
+        # One feedback per user per event; also serves the pending-feedback lookup
+        IndexModel([("user_id", ASCENDING), ("event_id", ASCENDING)], unique=True),
+    ],
+    "payment_sessions": [
+        # Processed checkout session ids only matter while Stripe may retry
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=90 * 24 * 3600),
+    ],
+    "stripe_events": [
+        # Webhook inbox: workers claim the oldest due events
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)]),
+        # Processed events are kept for a month for debugging
+        IndexModel([("processed_at", ASCENDING)], expireAfterSeconds=30 * 24 * 3600),
+    ],
+    "rate_limits": [
+        # Buckets are dropped once they would have refilled anyway
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+# (description, collection, filter, sort) for each query the routes issue
+QUERY_SHAPES = [
+    ("store_user duplicate lookup", "users", {"clerk_id": "x"}, None),
+    ("get_all_events", "events", {}, [("date", 1), ("_id", 1)]),
+    ("get_all_events date range", "events", {"date": {"$gte": "2025-01-01", "$lte": "2025-12-31"}},
+     [("date", 1), ("_id", 1)]),
+    ("get_user_events", "events", {"organizer_id": "x"}, [("date", 1), ("_id", 1)]),
+    ("search_events", "events", {"$text": {"$search": "meetup"}, "organizer_id": "x"}, None),
+    ("get_registered_events", "events", {"_id": {"$in": [ObjectId()]}, "date": {"$gte": "2025-01-01"}},
+     [("date", 1), ("_id", 1)]),
+    ("event point lookup", "events", {"_id": {"$in": [ObjectId()]}}, None),
+    ("is_registered", "registrations", {"event_id": "x", "user_id": "y"}, None),
+    ("attendees_for_events", "registrations", {"event_id": {"$in": ["x"]}}, None),
+    ("registered_event_ids", "registrations", {"user_id": "x"}, None),
+    ("get_event_comments", "comments", {"event_id": "x"}, [("created_at", -1), ("_id", -1)]),
+    ("stream comment polling", "comments", {"event_id": {"$in": ["x"]}, "_id": {"$gt": ObjectId()}}, [("_id", 1)]),
+    ("get_event_feedback", "feedbacks", {"event_id": "x"}, [("_id", -1)]),
+    ("get_user_event_feedback", "feedbacks", {"user_id": "x", "event_id": "y"}, None),
+    ("get_pending_feedback reviewed", "feedbacks", {"user_id": "x"}, None),
+    ("feedback summaries", "feedback_summaries", {"_id": {"$in": ["x"]}}, None),
+    ("webhook inbox claim", "stripe_events",
+     {"$or": [{"status": "pending", "next_attempt_at": {"$lte": datetime(2025, 1, 1)}},
+              {"status": "processing", "locked_until": {"$lte": datetime(2025, 1, 1)}}]},
+     [("next_attempt_at", 1)]),
+]
+
+
+def sync_indexes(drop_unknown=False):
+    """
+    Create any missing registry index. Existing indexes with the same spec
+    are left alone, so this is safe to run on every deploy.
+
+    Returns a dict of ``collection -> [index names not in the registry]``;
+    those are dropped when ``drop_unknown`` is set.
+    """
+    db = get_db()
+    unknown = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        collection.create_indexes(models)
+        wanted = {model.document["name"] for model in models} | {"_id_"}
+        extra = [name for name in collection.index_information() if name not in wanted]
+        if extra:
+            unknown[collection_name] = extra
+            if drop_unknown:
+                for name in extra:
+                    collection.drop_index(name)
+    return unknown
+
+
+def _key_spec(key):
+    return tuple((field, int(direction) if isinstance(direction, float) else direction) for field, direction in key)
+
+
+def missing_unique_indexes():
+    """
+    Return ``"collection (fields)"`` for every unique registry index the
+    server does not have. Registrations and feedback rely on these (and
+    payment_sessions on its ``_id``) to reject duplicates.
+    """
+    db = get_db()
+    missing = []
+    for collection_name, models in INDEXES.items():
+        unique_models = [model.document for model in models if model.document.get("unique")]
+        if not unique_models:
+            continue
+        existing = {_key_spec(info["key"]) for info in db[collection_name].index_information().values()
+                    if info.get("unique")}
+        for document in unique_models:
+            key = _key_spec(document["key"].items())
+            if key not in existing:
+                missing.append(f"{collection_name} ({', '.join(field for field, _ in key)})")
+    return missing
+
+
+def check_unique_indexes(strict=False):
+    """
+    Log an error when unique indexes are missing; with ``strict``, raise
+    ``RuntimeError`` instead. Returns the missing indexes.
+    """
+    try:
+        missing = missing_unique_indexes()
+    except PyMongoError as e:
+        if strict:
+            raise RuntimeError(f"Could not check unique indexes: {e}") from e
+        logger.error("Could not check unique indexes: %s", e)
+        return []
+    if missing:
+        message = ("Unique indexes missing, so duplicates will not be rejected: %s. "
+                   "Run 'flask sync-indexes'." % "; ".join(missing))
+        if strict:
+            raise RuntimeError(message)
+        logger.error(message)
+    return missing
+
+
+def _plan_uses_collscan(plan):
+    return '"COLLSCAN"' in json.dumps(plan, default=str)
+
+
+def check_query_plans():
+    """
+    Run ``explain()`` on every registered query shape and return the
+    descriptions of those whose winning plan contains a COLLSCAN.
+    """
+    db = get_db()
+    failures = []
+    for description, collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        if _plan_uses_collscan(plan):
+            failures.append(description)
+    return failures
@@ -0,0 +1,142 @@
+# json_provider.py
+"""
+orjson-backed JSON for Flask and Quart, plus generators that stream a listing
+as a JSON array or NDJSON straight from a cursor.
+
+Output follows Flask's default provider in sorted keys, compact separators
+and dates as HTTP dates, and ObjectIds serialize as their hex string. One
+difference: non-ASCII text is written as raw UTF-8 ("café") where Flask
+escapes it (ensure_ascii, "caf\\u00e9"). Both decode to the same JSON, but the
+bytes, and so the ETags of such responses, differ from before. orjson is
+optional; without it the standard library encoder is used with the same
+rules, ensure_ascii off included.
+"""
+import json
+from datetime import date
+from bson.objectid import ObjectId
+from flask.json.provider import JSONProvider, DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is slower but equivalent
+    orjson = None
+
+# Streamed bodies are written in chunks of about this size rather than per document
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, date):
+        return http_date(value)
+    return DefaultJSONProvider.default(value)
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(obj, indent=False):
+        """
+        Serialize ``obj`` to UTF-8 JSON bytes.
+        """
+        return orjson.dumps(obj, default=_default, option=_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+
+    loads = orjson.loads
+else:
+    def dumps(obj, indent=False):
+        return json.dumps(obj, default=_default, sort_keys=True, ensure_ascii=False,
+                          indent=2 if indent else None, separators=None if indent else (",", ":")).encode()
+
+    loads = json.loads
+
+
+class FastJSONProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Bytes go straight into the response without a str round trip
+        return self._app.response_class(dumps(obj, indent=self._app.debug) + b"\n", mimetype="application/json")
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
+
+
+def _chunks(pieces):
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= STREAM_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _array_pieces(items):
+    yield b"["
+    separator = b""
+    for item in items:
+        yield separator + dumps(item)
+        separator = b","
+    yield b"]\n"
+
+
+def json_array_stream(items):
+    """
+    Encode an iterable as one JSON array, holding one chunk in memory at a time.
+    """
+    return _chunks(_array_pieces(items))
+
+
+def ndjson_stream(items):
+    """
+    Encode an iterable as newline-delimited JSON, one document per line.
+    """
+    return _chunks(dumps(item) + b"\n" for item in items)
+
+
+async def _achunks(pieces):
+    buffer = bytearray()
+    async for piece in pieces:
+        buffer += piece
+        if len(buffer) >= STREAM_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def _async_array_pieces(items):
+    yield b"["
+    separator = b""
+    async for item in items:
+        yield separator + dumps(item)
+        separator = b","
+    yield b"]\n"
+
+
+async def _async_ndjson_pieces(items):
+    async for item in items:
+        yield dumps(item) + b"\n"
+
+
+def async_json_array_stream(items):
+    """
+    ``json_array_stream`` for an async iterable.
+    """
+    return _achunks(_async_array_pieces(items))
+
+
+def async_ndjson_stream(items):
+    """
+    ``ndjson_stream`` for an async iterable.
+    """
+    return _achunks(_async_ndjson_pieces(items))
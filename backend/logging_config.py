@@ -0,0 +1,130 @@
+# logging_config.py
+"""
+Structured JSON logging through a background queue.
+
+Request handlers only put records on an in-memory queue; a single listener
+thread formats them and writes to stdout, so slow or blocked stdout never adds
+to request latency. Each record carries the current request id.
+
+Environment:
+    LOG_LEVEL                 root level (default INFO)
+    LOG_LEVELS                per-logger overrides, e.g. "routes.event_routes=DEBUG,webhooks=WARNING"
+    LOG_DEBUG_SAMPLE_RATE     fraction of DEBUG records kept (default 1.0)
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from flask import g, has_request_context, request
+
+_listener = None
+_queue_handler = None
+
+# Request id for servers without Flask's request context (the asyncio app)
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Attach the id of the request being handled, if any.
+    """
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = g.get("request_id") if has_request_context() else request_id_var.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of DEBUG records; other levels always pass.
+    """
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+def _start_listener():
+    global _listener
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    # A fresh queue, since the parent's may have been mid-operation at fork time
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """
+    Route all logging through the queue. Safe to call more than once.
+    """
+    global _queue_handler
+    if _queue_handler is not None:
+        return
+
+    # The request id is read in the request thread, before the record is queued
+    _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(RequestIdFilter())
+    _queue_handler.addFilter(DebugSamplingFilter(float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))))
+    _start_listener()
+    atexit.register(lambda: _listener.stop())
+    # The listener thread does not survive a fork; give each child its own
+    os.register_at_fork(after_in_child=_start_listener)
+
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in _parse_levels(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level)
+
+
+def init_app(app):
+    """
+    Give every request an id (taken from X-Request-ID when the caller sends one)
+    and echo it back on the response.
+    """
+    @app.before_request
+    def _assign_request_id():
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+
+    @app.after_request
+    def _echo_request_id(response):
+        if "request_id" in g:
+            response.headers["X-Request-ID"] = g.request_id
+        return response
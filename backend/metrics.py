@@ -0,0 +1,235 @@
+# metrics.py
+"""
+Minimal Prometheus-style metrics, exposed in the text format at /metrics.
+
+Covers request counts and latency per route and status, MongoDB command
+timings per collection and command (via a pymongo CommandListener), the
+connection pool, and the response cache.
+"""
+import threading
+import time
+from bisect import bisect_left
+from flask import request, g
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for labels, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests handled.", ("endpoint", "method", "status"))
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency.", ("endpoint", "method", "status"))
+MONGO_COMMANDS = Histogram("mongodb_command_duration_seconds", "MongoDB command latency.",
+                           ("collection", "command", "outcome"),
+                           buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+POOL_CONNECTIONS = Gauge("mongodb_pool_connections", "Open MongoDB connections.", ("address",))
+POOL_CHECKED_OUT = Gauge("mongodb_pool_checked_out", "MongoDB connections in use.", ("address",))
+POOL_CHECKOUT_FAILURES = Counter("mongodb_pool_checkout_failures_total", "Failed connection checkouts.",
+                                 ("address", "reason"))
+RESPONSES_COMPRESSED = Counter("http_responses_compressed_total", "Response bodies compressed.", ("encoding",))
+COMPRESSION_BYTES = Counter("http_compression_bytes_total", "Bytes into and out of response compression.",
+                            ("encoding", "direction"))
+RATE_LIMITED = Counter("rate_limited_requests_total", "Requests refused by rate or concurrency limits.",
+                       ("route", "reason"))
+
+_registry = [REQUESTS, REQUEST_LATENCY, MONGO_COMMANDS, POOL_CONNECTIONS, POOL_CHECKED_OUT, POOL_CHECKOUT_FAILURES,
+             RESPONSES_COMPRESSED, COMPRESSION_BYTES, RATE_LIMITED]
+# Callables returning extra exposition lines at scrape time (e.g. cache stats)
+_collectors = []
+
+
+def register_collector(collector):
+    _collectors.append(collector)
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+class CommandTimer(monitoring.CommandListener):
+    """
+    Times every MongoDB command by collection and command name.
+    """
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, outcome):
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMANDS.observe(event.duration_micros / 1e6, collection, event.command_name, outcome)
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Tracks open and checked-out connections per server.
+    """
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        POOL_CONNECTIONS.inc(_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        POOL_CONNECTIONS.dec(_address(event))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        POOL_CHECKOUT_FAILURES.inc(_address(event), str(event.reason))
+
+    def connection_checked_out(self, event):
+        POOL_CHECKED_OUT.inc(_address(event))
+
+    def connection_checked_in(self, event):
+        POOL_CHECKED_OUT.dec(_address(event))
+
+
+def _address(event):
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+def init_app(app):
+    """
+    Time every request and serve the registry at /metrics.
+    """
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+            labels = (endpoint, request.method, str(response.status_code))
+            REQUESTS.inc(*labels)
+            REQUEST_LATENCY.observe(time.perf_counter() - started, *labels)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
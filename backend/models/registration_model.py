@@ -0,0 +1,35 @@
+from datetime import datetime
+
+class Registration:
+    """
+    Model class for a user's registration to an event
+    """
+    def __init__(self, user_id, event_id, session_id=None):
+        self.user_id = user_id
+        self.event_id = event_id  # Stored as a string, like feedback.event_id
+        self.session_id = session_id  # Checkout session that paid for it, if any
+        self.created_at = datetime.now()
+    
+    def to_dict(self):
+        """
+        Convert registration object to dictionary for MongoDB storage
+        """
+        return {
+            "user_id": self.user_id,
+            "event_id": self.event_id,
+            "session_id": self.session_id,
+            "created_at": self.created_at
+        }
+    
+    @staticmethod
+    def from_dict(data):
+        """
+        Create registration object from dictionary
+        """
+        registration = Registration(
+            user_id=data.get("user_id"),
+            event_id=data.get("event_id"),
+            session_id=data.get("session_id")
+        )
+        registration.created_at = data.get("created_at", datetime.now())
+        return registration
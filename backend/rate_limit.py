@@ -0,0 +1,236 @@
+# rate_limit.py
+"""
+Per-client rate limiting and admission control for the write and payment
+routes.
+
+``rate_limited(name)`` puts a view behind two checks, configured per route:
+
+  * token buckets per client. Every request takes from a bucket for its
+    remote address and, when the JSON body names a ``user_id``/``userId``,
+    from one for that user too. Body fields are client-supplied, so changing
+    them never escapes the address bucket; the user bucket additionally
+    limits a user spread over several addresses. A client over either rate
+    gets ``429 Too Many Requests``.
+  * an optional cap on requests in flight in this process. Past it, new
+    requests get ``503 Service Unavailable`` at once instead of queueing for a
+    worker behind slow Stripe calls or uploads.
+
+Both answers carry ``Retry-After``. Behind a reverse proxy, wrap the app in
+werkzeug's ``ProxyFix`` so the remote address is the client's.
+
+Buckets live in process memory by default. With ``RATE_LIMIT_BACKEND=mongo``
+they are kept in the ``rate_limits`` collection and updated atomically, so
+every worker and host shares them; if MongoDB cannot be reached the request
+is let through rather than failed.
+
+Environment:
+    RATE_LIMIT_ENABLED        "false" turns both checks off
+    RATE_LIMIT_BACKEND        "memory" (default) or "mongo"
+    RATE_LIMIT_<NAME>         override a route's limit, e.g.
+                              RATE_LIMIT_PAYMENT="10/minute,burst=5,concurrency=8"
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, jsonify
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from database import rate_limits_collection
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# "<count>/<period>[,burst=<n>][,concurrency=<n>]"; burst defaults to count
+DEFAULT_LIMITS = {
+    "payment": "10/minute,burst=5,concurrency=16",
+    "comment": "30/minute,burst=10",
+    "register": "20/minute,burst=10",
+    "upload": "20/minute,burst=5,concurrency=8",
+}
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+# Buckets kept by the memory backend; the least recently used are dropped first
+MAX_MEMORY_BUCKETS = 100000
+BUSY_RETRY_AFTER = 1
+
+ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() != "false"
+BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+
+
+def parse_limit(spec):
+    """
+    Parse a limit spec into ``{"rate", "burst", "concurrency"}``, with
+    ``rate`` in tokens per second.
+    """
+    rate_part, *options = [part.strip() for part in spec.split(",")]
+    count, _, period = rate_part.partition("/")
+    if period not in PERIODS:
+        raise ValueError(f"Unknown rate limit period in '{spec}'")
+    limit = {"rate": int(count) / PERIODS[period], "burst": int(count), "concurrency": None}
+    for option in options:
+        key, _, value = option.partition("=")
+        if key not in ("burst", "concurrency"):
+            raise ValueError(f"Unknown rate limit option '{key}' in '{spec}'")
+        limit[key] = int(value)
+    return limit
+
+
+LIMITS = {name: parse_limit(os.getenv(f"RATE_LIMIT_{name.upper()}", spec)) for name, spec in DEFAULT_LIMITS.items()}
+
+
+def _retry_after(tokens, rate):
+    return max(1, math.ceil((1 - tokens) / rate))
+
+
+class MemoryBackend:
+    """
+    Token buckets for this process only.
+    """
+    def __init__(self, max_buckets=MAX_MEMORY_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key, limit):
+        """
+        Take a token from ``key``'s bucket. Returns ``(allowed, retry_after)``.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (limit["burst"], now))
+            tokens = min(limit["burst"], tokens + (now - updated_at) * limit["rate"])
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else _retry_after(tokens, limit["rate"])
+
+
+def bucket_update(limit):
+    """
+    Update pipeline that refills and takes from a bucket in one atomic
+    ``find_one_and_update``, on the server's clock. ``expires_at`` is when the
+    bucket would be full again, after which the TTL index may drop it.
+    """
+    refilled = {"$add": [
+        {"$ifNull": ["$tokens", limit["burst"]]},
+        {"$multiply": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, limit["rate"] / 1000]},
+    ]}
+    full_after_ms = int(limit["burst"] / limit["rate"] * 1000)
+    return [
+        {"$set": {"tokens": {"$min": [limit["burst"], refilled]}, "updated_at": "$$NOW"}},
+        {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+        {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                  "expires_at": {"$add": ["$$NOW", full_after_ms]}}},
+    ]
+
+
+def bucket_result(bucket, limit):
+    if bucket["allowed"]:
+        return True, 0
+    return False, _retry_after(bucket["tokens"], limit["rate"])
+
+
+class MongoBackend:
+    """
+    Token buckets shared by every process through the ``rate_limits`` collection.
+    """
+    def take(self, key, limit):
+        try:
+            bucket = rate_limits_collection.find_one_and_update(
+                {"_id": key}, bucket_update(limit), upsert=True, return_document=ReturnDocument.AFTER)
+        except PyMongoError as e:
+            logger.warning("Rate limit check failed, allowing request: %s", e)
+            return True, 0
+        return bucket_result(bucket, limit)
+
+
+class ConcurrencyLimiter:
+    """
+    Counts requests in flight in this process and refuses new ones past ``limit``.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+backend = MongoBackend() if BACKEND == "mongo" else MemoryBackend()
+concurrency_limiters = {name: ConcurrencyLimiter(limit["concurrency"])
+                        for name, limit in LIMITS.items() if limit["concurrency"]}
+
+
+def client_keys(name, data, remote_addr):
+    """
+    The buckets a request takes from: always its address, plus the user id
+    from its JSON body when there is one.
+    """
+    keys = [f"{name}:ip:{remote_addr}"]
+    if isinstance(data, dict):
+        user_id = data.get("user_id") or data.get("userId")
+        if user_id:
+            keys.append(f"{name}:user:{user_id}")
+    return keys
+
+
+def too_many_requests(name, retry_after):
+    metrics.RATE_LIMITED.inc(name, "rate")
+    return {"error": "Too many requests, please slow down"}, 429, {"Retry-After": str(retry_after)}
+
+
+def server_busy(name):
+    metrics.RATE_LIMITED.inc(name, "concurrency")
+    return {"error": "Server is busy, please try again shortly"}, 503, {"Retry-After": str(BUSY_RETRY_AFTER)}
+
+
+def metrics_lines():
+    lines = ["# TYPE rate_limit_in_flight gauge"]
+    for name, limiter in concurrency_limiters.items():
+        lines.append(f'rate_limit_in_flight{{route="{name}"}} {limiter.in_flight}')
+    return lines
+
+
+def rate_limited(name):
+    """
+    Apply the ``name`` entry of ``LIMITS`` to a view.
+    """
+    limit = LIMITS[name]
+    limiter = concurrency_limiters.get(name)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return view(*args, **kwargs)
+            for key in client_keys(name, request.get_json(silent=True), request.remote_addr):
+                allowed, retry_after = backend.take(key, limit)
+                if not allowed:
+                    body, status, headers = too_many_requests(name, retry_after)
+                    return jsonify(body), status, headers
+            if limiter is None:
+                return view(*args, **kwargs)
+            if not limiter.try_acquire():
+                body, status, headers = server_busy(name)
+                return jsonify(body), status, headers
+            try:
+                return view(*args, **kwargs)
+            finally:
+                limiter.release()
+        return wrapper
+    return decorator
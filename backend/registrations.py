@@ -0,0 +1,184 @@
+# registrations.py
+"""
+Helpers around the registrations collection.
+
+Each registration is its own document with a unique (event_id, user_id)
+index, so membership checks are indexed point lookups and the event document
+only carries the denormalised ``attendee_count``.
+
+Processed checkout session ids are kept in ``payment_sessions`` (unique
+``_id``, expired by a TTL index) instead of an ever-growing array on the event.
+"""
+from datetime import datetime, timezone
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import (events_collection, registrations_collection, payment_sessions_collection, database_name,
+                      DATABASE_NAME)
+from models.registration_model import Registration
+from cache import response_cache
+
+REGISTERED = "registered"
+ALREADY_REGISTERED = "already_registered"
+SESSION_PROCESSED = "session_processed"
+
+
+class EventNotFound(Exception):
+    pass
+
+
+def _attendee_count(event_id):
+    event = events_collection.find_one({"_id": ObjectId(event_id)}, {"attendee_count": 1})
+    if not event:
+        raise EventNotFound(event_id)
+    return event.get("attendee_count", 0)
+
+
+def register_user(event_id, user_id, session_id=None):
+    """
+    Register a user for an event, at most once per user and per checkout session.
+
+    Returns an ``(outcome, attendee_count)`` tuple where outcome is one of
+    ``REGISTERED``, ``ALREADY_REGISTERED`` or ``SESSION_PROCESSED``. Raises
+    ``EventNotFound`` if the event does not exist or ``event_id`` is not an
+    ObjectId, in which case nothing is written.
+
+    The unique indexes on payment_sessions and registrations decide which
+    request wins, and only the winner increments the count (in the same
+    round trip that reads it back), so concurrent calls stay exact.
+    """
+    if not ObjectId.is_valid(event_id):
+        raise EventNotFound(event_id)
+    if session_id:
+        try:
+            payment_sessions_collection.insert_one({
+                "_id": session_id,
+                "event_id": event_id,
+                "user_id": user_id,
+                "created_at": datetime.now(timezone.utc)
+            })
+        except DuplicateKeyError:
+            return SESSION_PROCESSED, _attendee_count(event_id)
+
+    try:
+        registrations_collection.insert_one(Registration(user_id, event_id, session_id).to_dict())
+    except DuplicateKeyError:
+        return ALREADY_REGISTERED, _attendee_count(event_id)
+    except Exception:
+        _release_session(session_id)
+        raise
+
+    event = events_collection.find_one_and_update(
+        {"_id": ObjectId(event_id)},
+        {"$inc": {"attendee_count": 1}},
+        projection={"attendee_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if event is None:
+        # Undo the claims so the ids are not burnt by a bad request
+        registrations_collection.delete_one({"event_id": event_id, "user_id": user_id})
+        _release_session(session_id)
+        raise EventNotFound(event_id)
+
+    # Listings carry attendee counts and pending feedback depends on attendance
+    response_cache.invalidate("events", f"user:{user_id}")
+    return REGISTERED, event["attendee_count"]
+
+
+def _release_session(session_id):
+    if session_id:
+        payment_sessions_collection.delete_one({"_id": session_id})
+
+
+def is_registered(event_id, user_id):
+    return registrations_collection.find_one(
+        {"event_id": event_id, "user_id": user_id}, {"_id": 1}
+    ) is not None
+
+
+def attendees_for_events(event_ids):
+    """
+    Return a dict mapping each event id to its list of attendee user ids,
+    fetched with a single query.
+    """
+    attendees = {event_id: [] for event_id in event_ids}
+    if not event_ids:
+        return attendees
+    for registration in registrations_collection.find(
+        {"event_id": {"$in": list(event_ids)}}, {"_id": 0, "event_id": 1, "user_id": 1}
+    ):
+        attendees[registration["event_id"]].append(registration["user_id"])
+    return attendees
+
+
+def registered_event_ids(user_id):
+    return [
+        registration["event_id"]
+        for registration in registrations_collection.find({"user_id": user_id}, {"_id": 0, "event_id": 1})
+    ]
+
+
+def migrate_embedded_attendees():
+    """
+    Move legacy ``events.attendees`` and ``events.payment_sessions`` arrays
+    into their own collections and recompute ``attendee_count``. Safe to run
+    more than once.
+    """
+    migrated = 0
+    legacy = {"$or": [{"attendees": {"$exists": True}}, {"payment_sessions": {"$exists": True}}]}
+    for event in events_collection.find(legacy, {"attendees": 1, "payment_sessions": 1}):
+        event_id = str(event["_id"])
+        for session_id in event.get("payment_sessions", []):
+            try:
+                payment_sessions_collection.insert_one({
+                    "_id": session_id, "event_id": event_id, "created_at": datetime.now(timezone.utc)
+                })
+            except DuplicateKeyError:
+                pass
+        for user_id in event.get("attendees", []):
+            try:
+                registrations_collection.insert_one(Registration(user_id, event_id).to_dict())
+                migrated += 1
+            except DuplicateKeyError:
+                pass
+        count = registrations_collection.count_documents({"event_id": event_id})
+        events_collection.update_one(
+            {"_id": event["_id"]},
+            {"$set": {"attendee_count": count}, "$unset": {"attendees": "", "payment_sessions": ""}}
+        )
+    response_cache.clear()
+    return migrated
+
+
+def check_concurrent_registrations(users=200, threads=32, repeats=3):
+    """
+    Register ``users`` distinct users ``repeats`` times each from ``threads``
+    parallel threads against a scratch event, then compare the stored count
+    with the number of registrations. Returns ``(expected, attendee_count,
+    registrations)``; the scratch data is removed afterwards.
+
+    Refuses to run against the default database, like ``benchmark.seed``:
+    listings would show the scratch event while the check runs.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if database_name() == DATABASE_NAME:
+        raise SystemExit(f"Refusing to check '{DATABASE_NAME}'; set MONGO_DB_NAME to a scratch database")
+
+    event_id = str(events_collection.insert_one({
+        "title": "Concurrency check", "date": "", "attendee_count": 0
+    }).inserted_id)
+    calls = [(f"concurrency_user_{index}", f"concurrency_session_{index}_{attempt}")
+             for attempt in range(repeats) for index in range(users)]
+    try:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda call: register_user(event_id, *call), calls))
+        return (
+            users,
+            _attendee_count(event_id),
+            registrations_collection.count_documents({"event_id": event_id})
+        )
+    finally:
+        events_collection.delete_one({"_id": ObjectId(event_id)})
+        registrations_collection.delete_many({"event_id": event_id})
+        payment_sessions_collection.delete_many({"event_id": event_id})
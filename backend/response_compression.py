@@ -0,0 +1,106 @@
+# response_compression.py
+"""
+Negotiated gzip, brotli and zstd compression of API responses.
+
+The encoding is picked from the client's ``Accept-Encoding`` (honouring
+q-values, ties going to the server's order). Only textual bodies of at least
+``COMPRESSION_MIN_BYTES`` are compressed; images, streamed responses and
+bodies that already carry a ``Content-Encoding`` are left alone. Responses
+served from ``cache.cached`` are compressed there instead, once per encoding,
+and the compressed bytes are kept in the cache entry.
+
+brotli and zstandard are optional; without them only gzip is offered.
+
+Environment:
+    COMPRESSION_ENCODINGS     preference order (default "br,zstd,gzip"); empty disables compression
+    COMPRESSION_MIN_BYTES     smallest body worth compressing (default 1024)
+    COMPRESSION_LEVEL_GZIP    1-9 (default 6)
+    COMPRESSION_LEVEL_BR      0-11 (default 5)
+    COMPRESSION_LEVEL_ZSTD    1-22 (default 3)
+"""
+import gzip
+import os
+from flask import request
+import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional
+    zstandard = None
+
+MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_LEVEL_GZIP", "6"))
+BROTLI_LEVEL = int(os.getenv("COMPRESSION_LEVEL_BR", "5"))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_LEVEL_ZSTD", "3"))
+
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "application/javascript", "image/svg+xml"}
+
+_compressors = {"gzip": lambda data: gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)}
+if brotli is not None:
+    _compressors["br"] = lambda data: brotli.compress(data, quality=BROTLI_LEVEL)
+if zstandard is not None:
+    _compressors["zstd"] = lambda data: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+ENCODINGS = [encoding.strip() for encoding in os.getenv("COMPRESSION_ENCODINGS", "br,zstd,gzip").split(",")
+             if encoding.strip() in _compressors]
+
+
+def is_compressible(mimetype):
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES
+
+
+def negotiate(accept_encodings, mimetype, size):
+    """
+    The encoding to send a body of ``mimetype`` and ``size`` bytes in, or
+    None to send it as is. ``accept_encodings`` is the request's parsed
+    ``Accept-Encoding``.
+    """
+    if size < MIN_BYTES or not is_compressible(mimetype):
+        return None
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def compress(data, encoding):
+    compressed = _compressors[encoding](data)
+    metrics.RESPONSES_COMPRESSED.inc(encoding)
+    metrics.COMPRESSION_BYTES.inc(encoding, "in", amount=len(data))
+    metrics.COMPRESSION_BYTES.inc(encoding, "out", amount=len(compressed))
+    return compressed
+
+
+def encoded_etag(etag, encoding):
+    """
+    Each encoding is a different representation, so it gets its own strong ETag.
+    """
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def _should_compress(response):
+    return (response.status_code == 200 and not response.direct_passthrough and not response.is_streamed
+            and "Content-Encoding" not in response.headers and is_compressible(response.mimetype or ""))
+
+
+def init_app(app):
+    """
+    Compress eligible responses that did not come through the response cache.
+    """
+    @app.after_request
+    def _compress_response(response):
+        if not _should_compress(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        data = response.get_data()
+        encoding = negotiate(request.accept_encodings, response.mimetype, len(data))
+        if encoding is None:
+            return response
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(encoded_etag(etag, encoding), weak)
+        return response
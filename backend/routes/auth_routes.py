@@ -2,22 +2,22 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from database import users_collection  # Import from database.py
+from indexes import sync_indexes
 from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timezone
+import logging
 
 # Create authentication blueprint
 auth_blueprint = Blueprint("auth", __name__)
+logger = logging.getLogger(__name__)
 
-# Defer index creation until runtime
+# Index creation is a one-off deploy step ("flask sync-indexes"); app.py only
+# calls this at startup when SYNC_INDEXES_ON_STARTUP is set
 def initialize_indexes():
-    if users_collection is not None:
-        users_collection.create_index('clerk_id', unique=True)
-        print("Created unique index on 'clerk_id'")
-    else:
-        raise RuntimeError("users_collection is not initialized")
-
-# Call initialize_indexes when the blueprint is registered (handled in app.py)
-initialize_indexes()  # Temporary for testing, move to app.py later
+    unknown = sync_indexes()
+    logger.info("Synced database indexes")
+    for collection_name, names in unknown.items():
+        logger.warning("Indexes on '%s' not in the registry: %s", collection_name, ", ".join(names))
 
 @auth_blueprint.route("/store-user", methods=["POST"])
 @cross_origin()
@@ -65,5 +65,5 @@ def store_user():
             }), 409
     
     except Exception as e:
-        print(f"Error in user sync: {str(e)}")
+        logger.exception("Error in user sync: %s", e)
         return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
@@ -1,29 +1,38 @@
-from flask import Blueprint, request, jsonify, send_from_directory
-from database import events_collection, users_collection
+from flask import Blueprint, request, jsonify, send_from_directory, make_response, Response
+from werkzeug.exceptions import NotFound, RequestEntityTooLarge
+from database import events_collection, users_collection, comments_collection, events_read_collection, comments_read_collection
+from registrations import (register_user, is_registered, attendees_for_events, registered_event_ids, EventNotFound,
+                           REGISTERED, SESSION_PROCESSED)
+from cache import cached, response_cache
+from json_provider import json_array_stream, ndjson_stream, loads
+from webhooks import enqueue_event
+from rate_limit import rate_limited, ConcurrencyLimiter, server_busy
+from streams import (broadcaster, format_sse, attendee_count_message, HEARTBEAT_SECONDS, MAX_STREAM_EVENTS,
+                     MAX_SUBSCRIBERS, SUBSCRIBER_QUEUE_SIZE, RETRY_SECONDS)
+from images import (UPLOAD_FOLDER, MAX_UPLOAD_BYTES, UploadTooLarge, store_upload, best_variant,
+                    is_content_addressed, IMAGE_SERVE_MODE, IMAGE_ACCEL_PREFIX, IMMUTABLE_MAX_AGE, LEGACY_MAX_AGE)
 from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
 import os
 from werkzeug.utils import secure_filename
 from flask_cors import cross_origin
 import stripe
 import urllib.parse
-from dotenv import load_dotenv
-import traceback
+import logging
 import json
-
-# Load environment variables
-load_dotenv()
+import base64
+import mimetypes
+import queue
+from datetime import datetime, timezone
 
 # Create blueprint
 event_blueprint = Blueprint("event_routes", __name__)
+logger = logging.getLogger(__name__)
 
-# Configure upload folder
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads')
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-# Set Stripe API key from environment variable with fallback
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "sk_test_51R8jhnJoj9GjRK6iewTSQnPbjUbdz7Pxuu9tofTAKGk0P0RkafUUUPBTLiyxMGLzU0GQOh4Nd8ljRbmzx7PLBXuk00LIp7hTsQ")
-print(f"Stripe API key set to: {stripe.api_key[:8]}...")  # Debug key
+def configure_stripe():
+    # Set Stripe API key from environment variable with fallback; called by create_app
+    # once the .env file is loaded
+    stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "sk_test_51R8jhnJoj9GjRK6iewTSQnPbjUbdz7Pxuu9tofTAKGk0P0RkafUUUPBTLiyxMGLzU0GQOh4Nd8ljRbmzx7PLBXuk00LIp7hTsQ")
 
 # Health check route
 @event_blueprint.route('/health', methods=['GET'])
@@ -36,111 +45,526 @@ def health_check():
 def create_event():
     data = request.json
 
-    required_fields = ["title", "description", "date", "location", "organizer_id"]
-    if not all(field in data for field in required_fields):
+    if _missing_fields(data):
         return jsonify({"error": "Missing required fields"}), 400
 
-    event = {
+    event_id = events_collection.insert_one(_event_document(data)).inserted_id
+    response_cache.invalidate("events")
+    return jsonify({"message": "Event created successfully", "event_id": str(event_id)}), 201
+
+
+REQUIRED_EVENT_FIELDS = ["title", "description", "date", "location", "organizer_id"]
+# Every field _event_document reads; exports carry exactly these (plus _id and attendees)
+EVENT_INPUT_FIELDS = REQUIRED_EVENT_FIELDS + ["image_url", "banner_image", "gallery_images"]
+# Events per insert_many when importing, and failed lines listed in the report
+BULK_BATCH_SIZE = 1000
+MAX_BULK_ERRORS = 1000
+
+
+def _missing_fields(data):
+    return [field for field in REQUIRED_EVENT_FIELDS if field not in data]
+
+
+def _event_document(data):
+    return {
         "title": data["title"],
         "description": data["description"],
         "date": data["date"],
         "location": data["location"],
         "organizer_id": data["organizer_id"],  # Clerk user ID
-        "attendees": [],  # Empty list initially
-        "attendee_count": 0,  # Initialize attendee count
+        "attendee_count": 0,  # Registrations live in their own collection
         "image_url": data.get("image_url", ""),  # Store image URL with default empty string
         "banner_image": data.get("banner_image", ""),  # Optional banner image
-        "gallery_images": data.get("gallery_images", []),  # Optional array of additional images
-        "payment_sessions": []  # Track processed payment sessions
+        "gallery_images": data.get("gallery_images", [])  # Optional array of additional images
     }
 
-    event_id = events_collection.insert_one(event).inserted_id
-    return jsonify({"message": "Event created successfully", "event_id": str(event_id)}), 201
+
+def _parse_bulk_line(line):
+    """
+    Turn one NDJSON line into a new event document, with the same rules as
+    create_event. Returns ``(event, None)`` or ``(None, error)``.
+    """
+    try:
+        data = loads(line)
+    except ValueError:
+        return None, {"error": "Invalid JSON"}
+    if not isinstance(data, dict):
+        return None, {"error": "Expected a JSON object"}
+    missing = _missing_fields(data)
+    if missing:
+        return None, {"error": "Missing required fields", "missing": missing}
+    return _event_document(data), None
+
+
+def _add_bulk_error(report, line_number, error):
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_BULK_ERRORS:
+        report["errors"].append(dict(error, line=line_number))
+
+
+def _add_bulk_write_errors(report, line_numbers, e):
+    """
+    Record what an unordered insert_many managed before a ``BulkWriteError``.
+    """
+    report["inserted"] += e.details.get("nInserted", 0)
+    for error in e.details.get("writeErrors", []):
+        _add_bulk_error(report, line_numbers[error["index"]], {"error": error.get("errmsg", "Write failed")})
+
+
+def _bulk_result(report):
+    """
+    The response body and status for a finished import.
+    """
+    if report["inserted"]:
+        response_cache.invalidate("events")
+    elif not report["failed"]:
+        return {"error": "No events in request body"}, 400
+    logger.info("Bulk import: %d inserted, %d failed", report["inserted"], report["failed"])
+    return report, 201 if report["inserted"] else 400
+
+
+def _insert_bulk_batch(report, batch, line_numbers):
+    try:
+        report["inserted"] += len(events_collection.insert_many(batch, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        _add_bulk_write_errors(report, line_numbers, e)
+
+# Route to import many events from a streamed NDJSON body, one event per line.
+# Valid lines are written in unordered batches; invalid ones are reported by
+# line number as {"inserted", "failed", "errors": [{"line", "error"}, ...]}.
+@event_blueprint.route("/bulk", methods=["POST"])
+@cross_origin()
+def bulk_create_events():
+    report = {"inserted": 0, "failed": 0, "errors": []}
+    batch, line_numbers = [], []
+    for line_number, line in enumerate(request.stream, start=1):
+        if not line.strip():
+            continue
+        event, error = _parse_bulk_line(line)
+        if error:
+            _add_bulk_error(report, line_number, error)
+            continue
+        batch.append(event)
+        line_numbers.append(line_number)
+        if len(batch) == BULK_BATCH_SIZE:
+            _insert_bulk_batch(report, batch, line_numbers)
+            batch, line_numbers = [], []
+    if batch:
+        _insert_bulk_batch(report, batch, line_numbers)
+    body, status = _bulk_result(report)
+    return jsonify(body), status
+
+# Fields returned by the listing routes. The summary view drops the attendees
+# array so each page costs the same regardless of how many people registered.
+LISTING_FIELDS = ["_id", "title", "description", "date", "location", "organizer_id",
+                  "image_url", "banner_image", "attendee_count"]
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Documents fetched (and given attendees) per round trip when streaming a listing
+STREAM_BATCH_SIZE = 500
+
+
+def _listing_projection():
+    return {field: 1 for field in LISTING_FIELDS}
+
+
+def _format_event(event, base_url):
+    event["_id"] = str(event["_id"])
+    # Cards and banners point at the resized variants once they are generated
+    if event.get("image_url") and not event["image_url"].startswith(('http://', 'https://')):
+        event["image_url"] = f"{base_url}/api/events/images/{best_variant(event['image_url'], 'card')}"
+    if event.get("banner_image") and not event["banner_image"].startswith(('http://', 'https://')):
+        event["banner_image"] = f"{base_url}/api/events/images/{best_variant(event['banner_image'], 'banner')}"
+    event.setdefault("attendee_count", 0)
+    return event
+
+
+def _encode_cursor(sort_value, object_id):
+    raw = json.dumps({"d": sort_value, "i": str(object_id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(token):
+    """
+    Return the ``(sort_value, ObjectId)`` of a cursor from ``_encode_cursor``.
+    Raises ``ValueError`` unless the sort value is a string, number or null and
+    the id a valid ObjectId, so a crafted token cannot put an operator such as
+    ``{"$ne": null}`` into the query.
+    """
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        sort_value, object_id = data["d"], data["i"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+    if isinstance(sort_value, bool) or not isinstance(sort_value, (str, int, float, type(None))):
+        raise ValueError("Invalid cursor")
+    if not isinstance(object_id, str) or not ObjectId.is_valid(object_id):
+        raise ValueError("Invalid cursor")
+    return sort_value, ObjectId(object_id)
+
+
+def _keyset_after(field, last_value, last_id, direction=1):
+    """
+    Filter for the documents after ``(last_value, last_id)`` in a
+    ``(field, _id)`` sort in ``direction``. Null and missing values sort before
+    every other value and match neither ``$gt`` nor ``$lt``, so they are
+    handled explicitly: events without a date come first in ascending
+    listings and last in descending ones, and page like any other value.
+    """
+    after = "$gt" if direction == 1 else "$lt"
+    if last_value is None:
+        ties = {field: None, "_id": {after: last_id}}
+        return {"$or": [{field: {"$ne": None}}, ties]} if direction == 1 else ties
+    clauses = [{field: {after: last_value}}, {field: last_value, "_id": {after: last_id}}]
+    if direction == -1:
+        clauses.append({field: None})
+    return {"$or": clauses}
+
+
+def _apply_date_filter(query, args):
+    date_from = args.get("from")
+    date_to = args.get("to")
+    if date_from or date_to:
+        query["date"] = {}
+        if date_from:
+            query["date"]["$gte"] = date_from
+        if date_to:
+            query["date"]["$lte"] = date_to
+    return query
+
+
+def _search_pipeline(text, query, limit, token=None):
+    """
+    Aggregation for one page of text search results, best match first.
+
+    Pages are keyed on (score, _id), so ``token`` is the cursor of the last
+    result of the previous page. Raises ``ValueError`` for a bad cursor.
+    """
+    pipeline = [
+        {"$match": dict(query, **{"$text": {"$search": text}})},
+        {"$project": dict(_listing_projection(), score={"$meta": "textScore"})},
+    ]
+    if token:
+        try:
+            last_score, last_id = _decode_cursor(token)
+        except Exception:
+            raise ValueError("Invalid cursor")
+        if not isinstance(last_score, (int, float)):
+            raise ValueError("Invalid cursor")
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": last_score}},
+            {"score": last_score, "_id": {"$gt": last_id}}
+        ]}})
+    pipeline += [{"$sort": {"score": -1, "_id": 1}}, {"$limit": limit + 1}]
+    return pipeline
+
+
+def _with_attendees(events, summary):
+    if not summary and events:
+        # Attendee lists come from the registrations collection in one query
+        attendees = attendees_for_events([event["_id"] for event in events])
+        for event in events:
+            event["attendees"] = attendees[event["_id"]]
+    return events
+
+
+def _listing_response(events, next_token, summary, paginated):
+    base_url = request.host_url.rstrip('/')
+    events = _with_attendees([_format_event(event, base_url) for event in events], summary)
+
+    if paginated:
+        return jsonify({"events": events, "next": next_token}), 200
+    return jsonify(events), 200
+
+
+def _stream_listing(cursor, summary, stream_format, format_event=None):
+    """
+    Stream every event from ``cursor`` as a JSON array (``stream=json``) or
+    NDJSON (``stream=ndjson``), a batch at a time, without building the list.
+    ``format_event`` replaces the listing formatting (absolute image URLs).
+    """
+    if format_event is None:
+        base_url = request.host_url.rstrip('/')
+        format_event = lambda event: _format_event(event, base_url)
+
+    def events():
+        batch = []
+        for event in cursor.batch_size(STREAM_BATCH_SIZE):
+            batch.append(format_event(event))
+            if len(batch) == STREAM_BATCH_SIZE:
+                yield from _with_attendees(batch, summary)
+                batch = []
+        yield from _with_attendees(batch, summary)
+
+    if stream_format == "ndjson":
+        return Response(ndjson_stream(events()), mimetype="application/x-ndjson")
+    return Response(json_array_stream(events()), mimetype="application/json")
+
+
+def _list_events(query, paginated=None):
+    """
+    Run a listing query with the options from the request's query string.
+
+    Without ``limit`` or ``cursor`` the legacy behaviour is kept and a plain
+    array is returned; ``stream=json`` or ``stream=ndjson`` streams it from
+    the cursor instead (such responses are not cached). With them (or
+    ``paginated=True``), events are paged by keyset on (date, _id) and the
+    response is ``{"events": [...], "next": <token or null>}``.
+    """
+    summary = request.args.get("view") == "summary"
+    _apply_date_filter(query, request.args)
+
+    if paginated is None:
+        paginated = "limit" in request.args or "cursor" in request.args
+    if paginated:
+        try:
+            limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        token = request.args.get("cursor")
+        if token:
+            try:
+                last_date, last_id = _decode_cursor(token)
+            except Exception:
+                return jsonify({"error": "Invalid cursor"}), 400
+            query = {"$and": [query, _keyset_after("date", last_date, last_id)]}
+
+    cursor = events_read_collection.find(query, _listing_projection()).sort([("date", 1), ("_id", 1)])
+    stream_format = request.args.get("stream")
+    if not paginated and stream_format in ("json", "ndjson"):
+        return _stream_listing(cursor, summary, stream_format)
+    if paginated:
+        # Fetch one extra document to know whether another page exists
+        cursor = cursor.limit(limit + 1)
+    events = list(cursor)
+
+    next_token = None
+    if paginated and len(events) > limit:
+        events = events[:limit]
+        next_token = _encode_cursor(events[-1].get("date"), events[-1]["_id"])
+
+    return _listing_response(events, next_token, summary, paginated)
 
 # Route to fetch all events
 @event_blueprint.route("/all", methods=["GET"])
+@cached("events")
 def get_all_events():
-    events = list(events_collection.find({}, {
-        "_id": 1, 
-        "title": 1, 
-        "description": 1, 
-        "date": 1, 
-        "location": 1, 
-        "organizer_id": 1,
-        "image_url": 1,  # Include image URL in response
-        "banner_image": 1,  # Include banner image in response
-        "attendees": 1,
-        "attendee_count": 1  # Include attendee count
-    }))
-    
-    base_url = request.host_url.rstrip('/')
-    for event in events:
-        event["_id"] = str(event["_id"])
-        if event.get("image_url") and not event["image_url"].startswith(('http://', 'https://')):
-            event["image_url"] = f"{base_url}/api/events/images/{event['image_url']}"
-        if event.get("banner_image") and not event["banner_image"].startswith(('http://', 'https://')):
-            event["banner_image"] = f"{base_url}/api/events/images/{event['banner_image']}"
-    
-    return jsonify(events), 200
+    return _list_events({})
 
 # Route to fetch user's events
 @event_blueprint.route("/my-events/<user_id>", methods=["GET"])
+@cached("events")
 def get_user_events(user_id):
-    events = list(events_collection.find({"organizer_id": user_id}, {
-        "_id": 1, 
-        "title": 1, 
-        "description": 1, 
-        "date": 1, 
-        "location": 1, 
-        "organizer_id": 1,
-        "image_url": 1,
-        "banner_image": 1,
-        "attendees": 1,
-        "attendee_count": 1
-    }))
-    
-    base_url = request.host_url.rstrip('/')
+    return _list_events({"organizer_id": user_id})
+
+# Route to export an organizer's events with their attendee lists, streamed as
+# NDJSON (or a JSON array with ``format=json``). Events are exported as stored,
+# with the fields /bulk accepts, so the lines can be fed back to it.
+@event_blueprint.route("/export/<organizer_id>", methods=["GET"])
+def export_events(organizer_id):
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in ("json", "ndjson"):
+        return jsonify({"error": "format must be json or ndjson"}), 400
+    cursor = events_read_collection.find({"organizer_id": organizer_id}, _export_projection()).sort(
+        [("date", 1), ("_id", 1)])
+    response = _stream_listing(cursor, False, export_format, format_event=_format_export_event)
+    response.headers["Content-Disposition"] = _export_disposition(organizer_id, export_format)
+    return response
+
+
+def _export_projection():
+    return {field: 1 for field in EVENT_INPUT_FIELDS}
+
+
+def _format_export_event(event):
+    # Image fields stay the stored upload names, not the listing's variant URLs
+    event["_id"] = str(event["_id"])
+    return event
+
+
+def _export_disposition(organizer_id, export_format):
+    return f'attachment; filename="events-{secure_filename(organizer_id) or "export"}.{export_format}"'
+
+# Route to search events by text, best match first, with the listing filters.
+# Without ``q`` it pages by date like the listings.
+@event_blueprint.route("/search", methods=["GET"])
+@cached("events")
+def search_events():
+    query = {}
+    if request.args.get("organizer_id"):
+        query["organizer_id"] = request.args["organizer_id"]
+
+    text = request.args.get("q", "").strip()
+    if not text:
+        return _list_events(query, paginated=True)
+
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    try:
+        pipeline = _search_pipeline(text, _apply_date_filter(query, request.args), limit, request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    events = list(events_read_collection.aggregate(pipeline))
+
+    next_token = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_token = _encode_cursor(events[-1]["score"], events[-1]["_id"])
     for event in events:
-        event["_id"] = str(event["_id"])
-        if event.get("image_url") and not event["image_url"].startswith(('http://', 'https://')):
-            event["image_url"] = f"{base_url}/api/events/images/{event['image_url']}"
-        if event.get("banner_image") and not event["banner_image"].startswith(('http://', 'https://')):
-            event["banner_image"] = f"{base_url}/api/events/images/{event['banner_image']}"
-    
-    return jsonify(events), 200
+        del event["score"]
+
+    return _listing_response(events, next_token, request.args.get("view") == "summary", paginated=True)
+
+# Sections of /registered: date comparison against now and sort direction
+REGISTERED_SECTIONS = {
+    "upcoming": ("$gte", 1),
+    "past": ("$lt", -1),
+}
+
+
+def _utc_now_iso():
+    """
+    Now in the format the frontend stores event dates in (``toISOString()``,
+    e.g. "2025-06-01T18:30:00.000Z"), so string comparisons order correctly.
+    """
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _registered_section_query(event_ids, section, now, token=None):
+    """
+    Query and sort for one page of a user's upcoming (soonest first) or past
+    (most recent first) events. Raises ``ValueError`` for a bad cursor.
+    """
+    operator, direction = REGISTERED_SECTIONS[section]
+    query = {"_id": {"$in": event_ids}, "date": {operator: now}}
+    if token:
+        try:
+            last_date, last_id = _decode_cursor(token)
+        except Exception:
+            raise ValueError("Invalid cursor")
+        query = {"$and": [query, _keyset_after("date", last_date, last_id, direction)]}
+    return query, [("date", direction), ("_id", direction)]
+
+
+def _registered_page(event_ids, section, now, limit, token=None):
+    if not event_ids:
+        return {"events": [], "next": None}
+    query, sort = _registered_section_query(event_ids, section, now, token)
+    events = list(events_read_collection.find(query, _listing_projection()).sort(sort).limit(limit + 1))
+    next_token = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_token = _encode_cursor(events[-1].get("date"), events[-1]["_id"])
+    base_url = request.host_url.rstrip('/')
+    return {"events": [_format_event(event, base_url) for event in events], "next": next_token}
+
+# Route to fetch the events a user registered for, split into upcoming and past.
+# With ``status`` only that section is returned, so its ``cursor`` can be followed.
+@event_blueprint.route("/registered/<user_id>", methods=["GET"])
+@cached("events", "user:{user_id}")
+def get_registered_events(user_id):
+    status = request.args.get("status")
+    if status and status not in REGISTERED_SECTIONS:
+        return jsonify({"error": "status must be 'upcoming' or 'past'"}), 400
+
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    # Event ids come from the (user_id, event_id) index; the events are then
+    # fetched by _id, so no attendee list is ever read
+    event_ids = [ObjectId(event_id) for event_id in registered_event_ids(user_id) if ObjectId.is_valid(event_id)]
+    now = _utc_now_iso()
+
+    try:
+        if status:
+            return jsonify(_registered_page(event_ids, status, now, limit, request.args.get("cursor"))), 200
+        return jsonify({section: _registered_page(event_ids, section, now, limit)
+                        for section in REGISTERED_SECTIONS}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 # Route to serve uploaded images
 @event_blueprint.route("/images/<path:filename>", methods=["GET"])
 @cross_origin()
 def get_image(filename):
     try:
-        decoded_filename = urllib.parse.unquote(filename)
-        secure_name = secure_filename(decoded_filename)
-        file_path = os.path.join(UPLOAD_FOLDER, secure_name)
-        if not os.path.exists(file_path):
-            return jsonify({"error": "Image not found"}), 404
-        return send_from_directory(UPLOAD_FOLDER, secure_name)
+        # Content-addressed names are already safe and their bytes never change
+        if is_content_addressed(filename):
+            secure_name = filename
+            max_age = IMMUTABLE_MAX_AGE
+        else:
+            secure_name = secure_filename(urllib.parse.unquote(filename))
+            max_age = LEGACY_MAX_AGE
+        
+        if IMAGE_SERVE_MODE in ("x-accel", "x-sendfile"):
+            # Hand the file to the fronting web server, which also handles
+            # conditional and range requests, instead of streaming it from Python
+            file_path = os.path.join(UPLOAD_FOLDER, secure_name)
+            if not os.path.isfile(file_path):
+                return jsonify({"error": "Image not found"}), 404
+            response = make_response("")
+            response.content_type = mimetypes.guess_type(secure_name)[0] or "application/octet-stream"
+            if IMAGE_SERVE_MODE == "x-accel":
+                response.headers["X-Accel-Redirect"] = f"{IMAGE_ACCEL_PREFIX}/{secure_name}"
+            else:
+                response.headers["X-Sendfile"] = os.path.abspath(file_path)
+        else:
+            # Werkzeug answers If-None-Match/If-Modified-Since and Range requests here
+            try:
+                response = send_from_directory(UPLOAD_FOLDER, secure_name, conditional=True, etag=True, max_age=max_age)
+            except NotFound:
+                return jsonify({"error": "Image not found"}), 404
+        
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        if max_age == IMMUTABLE_MAX_AGE:
+            response.cache_control.immutable = True
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # Route to upload images
 @event_blueprint.route("/upload-image", methods=["POST"])
+@rate_limited("upload")
 def upload_image():
-    if 'file' not in request.files:
+    # Reject oversized bodies before parsing the multipart form, and stop
+    # reading ones that grow past the limit without a Content-Length (chunked)
+    request.max_content_length = MAX_UPLOAD_BYTES
+    if request.content_length and request.content_length > MAX_UPLOAD_BYTES:
+        return jsonify({"error": f"Image exceeds {MAX_UPLOAD_BYTES} bytes"}), 413
+    
+    try:
+        files = request.files
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Image exceeds {MAX_UPLOAD_BYTES} bytes"}), 413
+    if 'file' not in files:
         return jsonify({"error": "No file part"}), 400
     
-    file = request.files['file']
+    file = files['file']
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
     
-    if file:
-        filename = secure_filename(file.filename)
-        file.save(os.path.join(UPLOAD_FOLDER, filename))
-        image_url = filename
-        return jsonify({"image_url": image_url}), 200
+    try:
+        image_url = store_upload(file)
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"image_url": image_url}), 200
 
 # Route to register for an event
 @event_blueprint.route("/register/<event_id>", methods=["POST"])
+@rate_limited("register")
 def register_for_event(event_id):
     data = request.json
     user_id = data.get("user_id")
@@ -148,14 +572,17 @@ def register_for_event(event_id):
     if not user_id:
         return jsonify({"error": "User ID is required"}), 400
 
-    event = events_collection.find_one({"_id": ObjectId(event_id)})
-    if not event:
+    if not ObjectId.is_valid(event_id):
+        return jsonify({"error": "Invalid event ID format"}), 400
+
+    try:
+        outcome, _ = register_user(event_id, user_id)
+    except EventNotFound:
         return jsonify({"error": "Event not found"}), 404
 
-    if user_id in event["attendees"]:
+    if outcome != REGISTERED:
         return jsonify({"message": "User already registered"}), 200
 
-    events_collection.update_one({"_id": ObjectId(event_id)}, {"$push": {"attendees": user_id}})
     return jsonify({"message": "User registered successfully"}), 200
 
 # Route to update event images
@@ -181,11 +608,13 @@ def update_event_images(event_id):
         {"_id": ObjectId(event_id)},
         {"$set": update_data}
     )
+    response_cache.invalidate("events")
     return jsonify({"message": "Event images updated successfully"}), 200
 
 # Route to get event details including images
 @event_blueprint.route("/create-payment", methods=["POST"])
 @cross_origin()
+@rate_limited("payment")
 def create_payment():
     try:
         data = request.json
@@ -198,8 +627,7 @@ def create_payment():
             return jsonify({"error": "Event ID is required"}), 400
             
         if user_id:
-            event = events_collection.find_one({"_id": ObjectId(event_id)})
-            if event and 'attendees' in event and user_id in event['attendees']:
+            if is_registered(event_id, user_id):
                 return jsonify({"error": "You are already registered for this event"}), 400
         
         checkout_session = stripe.checkout.Session.create(
@@ -227,172 +655,126 @@ def create_payment():
         
         return jsonify({'id': checkout_session.id})
     except Exception as e:
-        print(f"Error creating payment session: {str(e)}")
+        logger.exception("Error creating payment session: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # Fix the update-attendees endpoint
 @event_blueprint.route('/update-attendees/<event_id>', methods=['POST'])
 @cross_origin()
 def update_attendees(event_id):
-    print(f"Received update-attendees request for event_id: {event_id}")
     try:
         data = request.json
         user_id = data.get("user_id")
         session_id = data.get("session_id")
-        print(f"Received user_id: {user_id}, session_id: {session_id}")
+        logger.debug("update-attendees request", extra={"event_id": event_id, "has_session": bool(session_id)})
         
         if not user_id:
             return jsonify({"error": "User ID is required"}), 400
 
-        try:
-            object_id = ObjectId(event_id)
-        except:
+        if not ObjectId.is_valid(event_id):
             return jsonify({'error': 'Invalid event ID format'}), 400
 
-        event = events_collection.find_one({'_id': object_id})
-        if not event:
+        try:
+            outcome, attendee_count = register_user(event_id, user_id, session_id)
+        except EventNotFound:
             return jsonify({'error': 'Event not found'}), 404
-            
-        if 'attendees' not in event:
-            events_collection.update_one(
-                {'_id': object_id},
-                {'$set': {'attendees': [], 'attendee_count': 0, 'payment_sessions': []}}
-            )
-            event = events_collection.find_one({'_id': object_id})
-            
-        if user_id in event.get('attendees', []):
-            return jsonify({
-                'message': 'User already registered',
-                'attendees': len(event.get('attendees', [])),
-                'attendee_count': event.get('attendee_count', len(event.get('attendees', [])))
-            }), 200
-
-        if session_id and session_id in event.get('payment_sessions', []):
-            return jsonify({
-                'message': 'Payment already processed',
-                'attendees': len(event.get('attendees', [])),
-                'attendee_count': event.get('attendee_count', len(event.get('attendees', [])))
-            }), 200
-
-        update_data = {
-            '$addToSet': {'attendees': user_id},
-            '$inc': {'attendee_count': 1}
+
+        messages = {
+            REGISTERED: 'Attendee count updated',
+            SESSION_PROCESSED: 'Payment already processed'
         }
-        if session_id:
-            if 'payment_sessions' not in event:
-                update_data['$set'] = {'payment_sessions': [session_id]}
-            else:
-                update_data['$addToSet']['payment_sessions'] = session_id
-            
-        result = events_collection.update_one({'_id': object_id}, update_data)
-        
-        if result.modified_count > 0 or result.matched_count > 0:
-            updated_event = events_collection.find_one({'_id': object_id})
-            updated_attendees = updated_event.get('attendees', [])
-            return jsonify({
-                'message': 'Attendee count updated',
-                'attendees': len(updated_attendees),
-                'attendee_count': updated_event.get('attendee_count', len(updated_attendees))
-            }), 200
-        else:
-            return jsonify({'error': 'Failed to update attendees'}), 500
+        return jsonify({
+            'message': messages.get(outcome, 'User already registered'),
+            'attendees': attendee_count,
+            'attendee_count': attendee_count
+        }), 200
     except Exception as e:
-        traceback.print_exc()
-        print(f"Error updating attendees: {str(e)}")
+        logger.exception("Error updating attendees: %s", e)
         return jsonify({'error': str(e)}), 500
     
 
-# Stripe webhook handler
+# Stripe webhook handler: verify, persist to the inbox and acknowledge.
+# Registrations are applied by the webhook workers (see webhooks.py).
 @event_blueprint.route('/webhook', methods=['POST'])
 def stripe_webhook():
-    print("Webhook received - Raw data:", request.get_data(as_text=True))  # Log raw payload
-    print("Headers:", dict(request.headers))  # Log all headers
     payload = request.get_data(as_text=True)
     sig_header = request.headers.get('Stripe-Signature')
     try:
         webhook_secret = os.getenv('STRIPE_WEBHOOK_SECRET')
         if webhook_secret:
-            event = stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
-            print("Verified webhook event:", event['type'])
-        else:
-            event = json.loads(payload)
-            print("Unverified webhook event (no secret):", event['type'])
+            stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
+        event = json.loads(payload)
         
-        if event['type'] == 'checkout.session.completed':
-            session = event['data']['object']
-            event_id = session.get('metadata', {}).get('event_id')
-            user_id = session.get('metadata', {}).get('user_id')
-            session_id = session.get('id')
-            print(f"Processing payment: event_id={event_id}, user_id={user_id}, session_id={session_id}")
-            
-            if event_id and user_id:
-                try:
-                    object_id = ObjectId(event_id)
-                except:
-                    print("Invalid event_id format:", event_id)
-                    return jsonify({'error': 'Invalid event ID format'}), 400
-
-                event = events_collection.find_one({'_id': object_id})
-                if not event:
-                    print("Event not found for id:", event_id)
-                    return jsonify({'error': 'Event not found'}), 404
-
-                if user_id in event.get('attendees', []):
-                    print("User already registered:", user_id)
-                    return jsonify({'status': 'success'}), 200
-
-                if session_id and session_id in event.get('payment_sessions', []):
-                    print("Session already processed:", session_id)
-                    return jsonify({'status': 'success'}), 200
-
-                update_data = {
-                    '$addToSet': {'attendees': user_id, 'payment_sessions': session_id},
-                    '$inc': {'attendee_count': 1}
-                }
-                result = events_collection.update_one({'_id': object_id}, update_data)
-                print(f"Update result: modified={result.modified_count}, matched={result.matched_count}")
-                if result.modified_count == 0:
-                    print("No update applied, event doc:", events_collection.find_one({'_id': object_id}))
-
+        if not enqueue_event(event):
+            logger.info("Duplicate webhook event ignored", extra={"stripe_event_id": event['id']})
         return jsonify({'status': 'success'}), 200
-    except ValueError as e:
-        print("Invalid payload error:", str(e))
+    except (ValueError, KeyError) as e:
+        logger.warning("Invalid webhook payload: %s", e)
         return jsonify({'error': 'Invalid payload'}), 400
     except stripe.error.SignatureVerificationError as e:
-        print("Signature verification failed:", str(e))
+        logger.warning("Webhook signature verification failed: %s", e)
         return jsonify({'error': 'Invalid signature'}), 400
     except Exception as e:
-        print("Webhook error:", str(e))
+        logger.exception("Webhook error: %s", e)
         return jsonify({'error': str(e)}), 500
     
 
+DEFAULT_COMMENT_PAGE_SIZE = 50
+
+
+def _format_comment(comment):
+    comment["_id"] = str(comment["_id"])
+    return comment
+
+
 @event_blueprint.route('/<event_id>/comments', methods=['GET'])
 @cross_origin()
+@cached("comments:{event_id}")
 def get_event_comments(event_id):
     try:
         # Convert string ID to ObjectId
         event_oid = ObjectId(event_id)
         
         # Find the event
-        event = events_collection.find_one({'_id': event_oid})
+        event = events_read_collection.find_one({'_id': event_oid}, {'_id': 1})
         if not event:
             return jsonify({'error': 'Event not found'}), 404
         
-        # Get comments from the event or return empty list if none
-        comments = event.get('comments', [])
+        try:
+            limit = int(request.args.get('limit', DEFAULT_COMMENT_PAGE_SIZE))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        
+        # Newest first; ``before`` continues from the last comment of the previous page
+        query = {'event_id': event_id}
+        before = request.args.get('before')
+        if before:
+            try:
+                last_created_at, last_id = _decode_cursor(before)
+            except Exception:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query.update(_keyset_after('created_at', last_created_at, last_id, -1))
         
-        # Sort comments by created_at timestamp (newest first)
-        comments.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        comments = list(comments_read_collection.find(query, {'event_id': 0})
+                        .sort([('created_at', -1), ('_id', -1)])
+                        .limit(limit + 1))
         
-        return jsonify({'comments': comments}), 200
+        next_token = None
+        if len(comments) > limit:
+            comments = comments[:limit]
+            next_token = _encode_cursor(comments[-1]['created_at'], comments[-1]['_id'])
+        
+        return jsonify({'comments': [_format_comment(c) for c in comments], 'next': next_token}), 200
     
     except Exception as e:
-        print(f"Error fetching comments: {str(e)}")
+        logger.exception("Error fetching comments: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # Add a new comment to an event
 @event_blueprint.route('/<event_id>/comments', methods=['POST'])
 @cross_origin()
+@rate_limited("comment")
 def add_event_comment(event_id):
     try:
         # Convert string ID to ObjectId
@@ -403,57 +785,141 @@ def add_event_comment(event_id):
         if not data or 'text' not in data or not data['text'].strip():
             return jsonify({'error': 'Comment text is required'}), 400
         
-        # Create comment object with a unique ID
-        from datetime import datetime
+        if not events_collection.find_one({'_id': event_oid}, {'_id': 1}):
+            return jsonify({'error': 'Event not found'}), 404
+        
         comment = {
-            '_id': str(ObjectId()),  # Generate a unique ID for the comment
+            'event_id': event_id,
             'user_id': data.get('user_id', 'anonymous'),
             'username': data.get('username', 'Anonymous'),
             'text': data['text'].strip(),
             'created_at': datetime.utcnow().isoformat()
         }
+        comments_collection.insert_one(comment)
         
-        # Update the event with the new comment
-        # If 'comments' field doesn't exist yet, it will be created
-        result = events_collection.update_one(
-            {'_id': event_oid}, 
-            {'$push': {'comments': comment}}
-        )
-        
-        if result.modified_count == 0:
-            # Check if the event exists but no modification was made
-            event = events_collection.find_one({'_id': event_oid})
-            if not event:
-                return jsonify({'error': 'Event not found'}), 404
-        
-        return jsonify({'message': 'Comment added successfully', 'comment': comment}), 201
+        response_cache.invalidate(f"comments:{event_id}")
+        return jsonify({'message': 'Comment added successfully', 'comment': _format_comment(comment)}), 201
     
     except Exception as e:
-        print(f"Error adding comment: {str(e)}")
+        logger.exception("Error adding comment: %s", e)
         return jsonify({'error': str(e)}), 500
 
+def _parse_stream_ids(raw_ids):
+    event_ids = list(dict.fromkeys(event_id for event_id in raw_ids if event_id))
+    if not event_ids or len(event_ids) > MAX_STREAM_EVENTS:
+        raise ValueError(f"Between 1 and {MAX_STREAM_EVENTS} event ids are required")
+    if not all(ObjectId.is_valid(event_id) for event_id in event_ids):
+        raise ValueError("Invalid event ID format")
+    return event_ids
+
+
+# Each open stream holds a worker thread, so only so many are let in
+stream_slots = ConcurrencyLimiter(MAX_SUBSCRIBERS)
+
+
+def _event_stream(event_ids):
+    if not stream_slots.try_acquire():
+        body, status, headers = server_busy("stream")
+        return jsonify(body), status, headers
+    messages = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(message):
+        try:
+            messages.put_nowait(message)
+        except queue.Full:
+            pass  # A stalled client misses updates rather than holding up the watcher
+
+    # Subscribe before taking the snapshot so no change falls in between
+    unsubscribe = broadcaster.subscribe(event_ids, deliver)
+    try:
+        snapshot = list(events_read_collection.find(
+            {"_id": {"$in": [ObjectId(event_id) for event_id in event_ids]}}, {"attendee_count": 1}
+        ))
+    except Exception:
+        unsubscribe()
+        stream_slots.release()
+        raise
+
+    def generate():
+        try:
+            yield f"retry: {RETRY_SECONDS * 1000}\n\n"
+            for event in snapshot:
+                yield format_sse(attendee_count_message(event))
+            while True:
+                try:
+                    message = messages.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(message)
+        finally:
+            unsubscribe()
+
+    response = Response(generate(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Runs even if the client goes away before the first chunk
+    response.call_on_close(unsubscribe)
+    response.call_on_close(stream_slots.release)
+    return response
+
+# Live attendee counts and comments for one event, as Server-Sent Events
+@event_blueprint.route('/<event_id>/stream', methods=['GET'])
+@cross_origin()
+def stream_event(event_id):
+    try:
+        event_ids = _parse_stream_ids([event_id])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return _event_stream(event_ids)
+
+# The same for many events at once: /stream?ids=<id>,<id>,...
+@event_blueprint.route('/stream', methods=['GET'])
+@cross_origin()
+def stream_events():
+    try:
+        event_ids = _parse_stream_ids(request.args.get('ids', '').split(','))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return _event_stream(event_ids)
+
 # Optional: Delete a comment
 @event_blueprint.route('/<event_id>/comments/<comment_id>', methods=['DELETE'])
 @cross_origin()
 def delete_event_comment(event_id, comment_id):
     try:
-        # Convert string ID to ObjectId
-        event_oid = ObjectId(event_id)
-        
         # Check if user has permission (you may want to implement this)
         # For now we'll allow any deletion
         
-        # Update the event by removing the comment with the given ID
-        result = events_collection.update_one(
-            {'_id': event_oid},
-            {'$pull': {'comments': {'_id': comment_id}}}
-        )
+        try:
+            comment_oid = ObjectId(comment_id)
+        except Exception:
+            return jsonify({'error': 'Event or comment not found'}), 404
         
-        if result.modified_count == 0:
+        result = comments_collection.delete_one({'_id': comment_oid, 'event_id': event_id})
+        
+        if result.deleted_count == 0:
             return jsonify({'error': 'Event or comment not found'}), 404
         
+        response_cache.invalidate(f"comments:{event_id}")
         return jsonify({'message': 'Comment deleted successfully'}), 200
     
     except Exception as e:
-        print(f"Error deleting comment: {str(e)}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        logger.exception("Error deleting comment: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+
+def migrate_embedded_comments():
+    """
+    Move legacy ``events.comments`` arrays into the comments collection.
+    Safe to run more than once.
+    """
+    migrated = 0
+    for event in events_collection.find({'comments': {'$exists': True}}, {'comments': 1}):
+        for comment in event.get('comments', []):
+            comment = dict(comment, event_id=str(event['_id']))
+            comment['_id'] = ObjectId(comment['_id']) if ObjectId.is_valid(comment.get('_id')) else ObjectId()
+            comments_collection.replace_one({'_id': comment['_id']}, comment, upsert=True)
+            migrated += 1
+        events_collection.update_one({'_id': event['_id']}, {'$unset': {'comments': ''}})
+    response_cache.clear()
+    return migrated
@@ -1,13 +1,81 @@
 # routes/feedback_routes.py
 from flask import Blueprint, request, jsonify
-from database import feedbacks_collection, events_collection, users_collection
+from database import (feedbacks_collection, events_collection, users_collection, feedback_summaries_collection,
+                      events_read_collection, feedbacks_read_collection, feedback_summaries_read_collection)
 from bson.objectid import ObjectId
 from models.feedback_model import Feedback
-from datetime import datetime
+from datetime import datetime, timezone
 from flask_cors import cross_origin
+import logging
+from pymongo.errors import DuplicateKeyError
+from registrations import is_registered, registered_event_ids
+from cache import cached, response_cache
 
 # Create feedback blueprint
 feedback_blueprint = Blueprint("feedback_routes", __name__)
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEEDBACK_PAGE_SIZE = 20
+MAX_FEEDBACK_PAGE_SIZE = 100
+MAX_SUMMARY_BATCH = 200
+
+
+def _has_passed(date, now):
+    """
+    Whether a stored event date is before ``now`` (an aware UTC datetime).
+    Dates are stored by the frontend with ``toISOString()``; any without an
+    offset are taken as UTC, and unparseable ones as not passed.
+    """
+    try:
+        event_date = datetime.fromisoformat(date.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return False
+    if event_date.tzinfo is None:
+        event_date = event_date.replace(tzinfo=timezone.utc)
+    return event_date < now
+
+
+def _summary_view(summary):
+    """
+    Shape a stored rating summary (count, sum, 1-5 histogram) for the API.
+    """
+    summary = summary or {}
+    count = summary.get("count", 0)
+    histogram = summary.get("histogram", {})
+    return {
+        "count": count,
+        "average_rating": round(summary.get("sum", 0) / count, 1) if count else 0,
+        "histogram": {str(star): histogram.get(str(star), 0) for star in range(1, 6)}
+    }
+
+
+def _record_rating(event_id, rating):
+    # Single atomic upsert, so concurrent submissions never lose an update
+    feedback_summaries_collection.update_one(
+        {"_id": event_id},
+        {"$inc": {"count": 1, "sum": rating, f"histogram.{rating}": 1}},
+        upsert=True
+    )
+
+
+def backfill_feedback_summaries():
+    """
+    Rebuild every event's rating summary from the feedbacks collection.
+    """
+    rebuilt = 0
+    pipeline = [{"$group": {"_id": {"event_id": "$event_id", "rating": "$rating"}, "n": {"$sum": 1}}}]
+    summaries = {}
+    for row in feedbacks_collection.aggregate(pipeline):
+        event_id, rating = row["_id"]["event_id"], row["_id"]["rating"]
+        summary = summaries.setdefault(event_id, {"count": 0, "sum": 0, "histogram": {}})
+        summary["count"] += row["n"]
+        summary["sum"] += rating * row["n"]
+        summary["histogram"][str(rating)] = row["n"]
+    for event_id, summary in summaries.items():
+        feedback_summaries_collection.replace_one({"_id": event_id}, summary, upsert=True)
+        response_cache.invalidate(f"feedback:{event_id}")
+        rebuilt += 1
+    return rebuilt
 
 # Health check route
 @feedback_blueprint.route('/health', methods=['GET'])
@@ -29,24 +97,25 @@ def submit_feedback(event_id):
             return jsonify({"error": "Invalid feedback data. Rating must be between 1-5."}), 400
         
         # Check if event exists
-        event = events_collection.find_one({"_id": ObjectId(event_id)})
+        event = events_collection.find_one({"_id": ObjectId(event_id)}, {"_id": 1})
         if not event:
             return jsonify({"error": "Event not found"}), 404
         
         # Check if user attended the event
-        if user_id not in event.get("attendees", []):
+        if not is_registered(event_id, user_id):
             return jsonify({"error": "User did not attend this event"}), 403
         
-        # Check if user already submitted feedback
-        existing_feedback = feedbacks_collection.find_one({"user_id": user_id, "event_id": event_id})
-        if existing_feedback:
-            return jsonify({"error": "User already submitted feedback for this event"}), 409
-        
         # Create feedback object
         feedback = Feedback(user_id, event_id, rating, comment)
         
-        # Insert feedback into database
-        result = feedbacks_collection.insert_one(feedback.to_dict())
+        # Insert feedback into database; the unique (user_id, event_id) index
+        # rejects a second submission, even from concurrent requests
+        try:
+            result = feedbacks_collection.insert_one(feedback.to_dict())
+        except DuplicateKeyError:
+            return jsonify({"error": "User already submitted feedback for this event"}), 409
+        _record_rating(event_id, rating)
+        response_cache.invalidate(f"feedback:{event_id}", f"user:{user_id}")
         
         return jsonify({
             "message": "Feedback submitted successfully",
@@ -54,47 +123,77 @@ def submit_feedback(event_id):
         }), 201
     
     except Exception as e:
-        print(f"Error submitting feedback: {str(e)}")
+        logger.exception("Error submitting feedback: %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 # Route to get all feedback for an event
 @feedback_blueprint.route("/event/<event_id>", methods=["GET"])
+@cached("feedback:{event_id}")
 def get_event_feedback(event_id):
     try:
         # Check if event exists
-        event = events_collection.find_one({"_id": ObjectId(event_id)})
+        event = events_read_collection.find_one({"_id": ObjectId(event_id)}, {"_id": 1})
         if not event:
             return jsonify({"error": "Event not found"}), 404
         
-        # Get all feedback for the event
-        feedbacks = list(feedbacks_collection.find({"event_id": event_id}))
+        try:
+            limit = int(request.args.get("limit", DEFAULT_FEEDBACK_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        limit = max(1, min(limit, MAX_FEEDBACK_PAGE_SIZE))
+        
+        # Page through individual feedback newest first; ``before`` is the last _id seen
+        query = {"event_id": event_id}
+        before = request.args.get("before")
+        if before:
+            if not ObjectId.is_valid(before):
+                return jsonify({"error": "Invalid cursor"}), 400
+            query["_id"] = {"$lt": ObjectId(before)}
+        feedbacks = list(feedbacks_read_collection.find(query).sort("_id", -1).limit(limit + 1))
+        
+        next_token = None
+        if len(feedbacks) > limit:
+            feedbacks = feedbacks[:limit]
+            next_token = str(feedbacks[-1]["_id"])
         
-        # Convert ObjectId to string
         for feedback in feedbacks:
-            if "_id" in feedback:
-                feedback["_id"] = str(feedback["_id"])
-        
-        # Calculate average rating
-        avg_rating = 0
-        if feedbacks:
-            avg_rating = sum(feedback.get("rating", 0) for feedback in feedbacks) / len(feedbacks)
+            feedback["_id"] = str(feedback["_id"])
         
-        return jsonify({
-            "feedbacks": feedbacks,
-            "count": len(feedbacks),
-            "average_rating": round(avg_rating, 1)
-        }), 200
+        # The rating summary is maintained on write, so this is a single lookup
+        response = _summary_view(feedback_summaries_read_collection.find_one({"_id": event_id}))
+        response["feedbacks"] = feedbacks
+        response["next"] = next_token
+        return jsonify(response), 200
+    
+    except Exception as e:
+        logger.exception("Error getting event feedback: %s", e)
+        return jsonify({"error": "Internal server error"}), 500
+
+# Route to get rating summaries for many events in one call
+@feedback_blueprint.route("/summaries", methods=["GET"])
+def get_feedback_summaries():
+    try:
+        event_ids = [event_id for event_id in request.args.get("event_ids", "").split(",") if event_id]
+        if len(event_ids) > MAX_SUMMARY_BATCH:
+            return jsonify({"error": f"At most {MAX_SUMMARY_BATCH} event ids per request"}), 400
+        
+        stored = {
+            summary["_id"]: summary
+            for summary in feedback_summaries_read_collection.find({"_id": {"$in": event_ids}})
+        }
+        return jsonify({event_id: _summary_view(stored.get(event_id)) for event_id in event_ids}), 200
     
     except Exception as e:
-        print(f"Error getting event feedback: {str(e)}")
+        logger.exception("Error getting feedback summaries: %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 # Route to get user's feedback for an event
 @feedback_blueprint.route("/user/<user_id>/event/<event_id>", methods=["GET"])
+@cached("feedback:{event_id}")
 def get_user_event_feedback(user_id, event_id):
     try:
         # Find user's feedback for the event
-        feedback = feedbacks_collection.find_one({"user_id": user_id, "event_id": event_id})
+        feedback = feedbacks_read_collection.find_one({"user_id": user_id, "event_id": event_id})
         
         if not feedback:
             return jsonify({"message": "No feedback found"}), 404
@@ -106,37 +205,42 @@ def get_user_event_feedback(user_id, event_id):
         return jsonify(feedback), 200
     
     except Exception as e:
-        print(f"Error getting user feedback: {str(e)}")
+        logger.exception("Error getting user feedback: %s", e)
         return jsonify({"error": "Internal server error"}), 500
 
 # Route to get all events a user has attended but not yet provided feedback
 @feedback_blueprint.route("/pending/<user_id>", methods=["GET"])
+@cached("events", "user:{user_id}")
 def get_pending_feedback(user_id):
     try:
-        # Find all events the user has attended
-        attended_events = list(events_collection.find(
-            {"attendees": user_id},
+        # Three batched queries regardless of how many events the user attended:
+        # their registrations, the events they already reviewed, then the rest
+        reviewed = set(feedbacks_collection.distinct("event_id", {"user_id": user_id}))
+        unreviewed_ids = [
+            ObjectId(event_id) for event_id in registered_event_ids(user_id)
+            if event_id not in reviewed and ObjectId.is_valid(event_id)
+        ]
+        if not unreviewed_ids:
+            return jsonify([]), 200
+        
+        attended_events = events_collection.find(
+            {"_id": {"$in": unreviewed_ids}},
             {"_id": 1, "title": 1, "date": 1, "image_url": 1}
-        ))
+        )
         
-        # Convert ObjectId to string and filter past events
-        current_date = datetime.now()
+        # Convert ObjectId to string and keep past events
+        current_date = datetime.now(timezone.utc)
         pending_feedback_events = []
         
         for event in attended_events:
             event["_id"] = str(event["_id"])
-            event_id = event["_id"]
             
             # Check if event date has passed
-            event_date = datetime.fromisoformat(event["date"].replace('Z', '+00:00'))
-            if event_date < current_date:
-                # Check if user has already submitted feedback
-                existing_feedback = feedbacks_collection.find_one({"user_id": user_id, "event_id": event_id})
-                if not existing_feedback:
-                    pending_feedback_events.append(event)
+            if _has_passed(event.get("date"), current_date):
+                pending_feedback_events.append(event)
         
         return jsonify(pending_feedback_events), 200
     
     except Exception as e:
-        print(f"Error getting pending feedback events: {str(e)}")
+        logger.exception("Error getting pending feedback events: %s", e)
         return jsonify({"error": "Internal server error"}), 500
\ No newline at end of file
@@ -0,0 +1,224 @@
+# streams.py
+"""
+Live attendee counts and comments for the Server-Sent Events routes.
+
+Each process runs one watcher thread that follows the events and comments
+collections and fans every change out to the subscribers of that event, so
+MongoDB sees one watcher per process however many clients are connected.
+The watcher uses a change stream when the deployment supports one (replica
+set or sharded cluster) and otherwise polls, querying only the events that
+currently have subscribers. Whenever the watcher starts without a position to
+resume from, it re-sends the current attendee counts, so subscribers never
+keep a count from before a gap. Comments may then arrive twice; clients
+dedupe them by ``_id``.
+
+Under the Flask app every subscriber holds a worker thread for as long as it
+is connected, so each process accepts at most ``STREAM_MAX_SUBSCRIBERS`` and
+answers ``503`` past that. Serve the stream routes from ``asgi.py`` when many
+clients stay connected; there a subscriber is a coroutine and is not capped.
+
+Messages are dicts with a ``type``:
+
+    attendee_count    {"event_id", "attendee_count"}
+    comment           {"event_id", "comment"}
+    comment_deleted   {"event_id": None, "comment_id"}  (change streams only)
+
+Environment:
+    STREAM_MODE                 "auto" (default), "change-stream" or "poll"
+    STREAM_POLL_INTERVAL        seconds between polls (default 2)
+    STREAM_HEARTBEAT_SECONDS    keep-alive comment interval (default 15)
+    STREAM_MAX_SUBSCRIBERS      open streams per Flask process (default 32)
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from bson.objectid import ObjectId
+from pymongo.errors import OperationFailure
+from database import get_db, events_collection, comments_collection
+
+logger = logging.getLogger(__name__)
+
+STREAM_MODE = os.getenv("STREAM_MODE", "auto").lower()
+POLL_INTERVAL = float(os.getenv("STREAM_POLL_INTERVAL", "2"))
+HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "32"))
+SUBSCRIBER_QUEUE_SIZE = 100
+MAX_STREAM_EVENTS = 200
+RETRY_SECONDS = 5
+# Comments are looked for this far back on every poll: ObjectIds from other
+# processes or hosts are not created in order, so "newer than the last one
+# seen" would skip some
+POLL_COMMENT_LOOKBACK_SECONDS = 60
+
+# Server error codes meaning change streams are unavailable (standalone mongod)
+_CHANGE_STREAMS_UNSUPPORTED = {40573, 40324}
+# InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost: the
+# stream cannot continue from the saved token and must start afresh
+_CHANGE_STREAM_NOT_RESUMABLE = {260, 280, 286}
+
+_CHANGE_PIPELINE = [{"$match": {"$or": [
+    {"ns.coll": "events", "operationType": "update",
+     "updateDescription.updatedFields.attendee_count": {"$exists": True}},
+    {"ns.coll": "comments", "operationType": {"$in": ["insert", "delete"]}},
+]}}]
+
+
+def format_sse(message):
+    return f"event: {message['type']}\ndata: {json.dumps(message, default=str)}\n\n"
+
+
+def attendee_count_message(event):
+    return {"type": "attendee_count", "event_id": str(event["_id"]), "attendee_count": event.get("attendee_count", 0)}
+
+
+def _comment_message(comment):
+    comment = dict(comment, _id=str(comment["_id"]))
+    return {"type": "comment", "event_id": comment["event_id"], "comment": comment}
+
+
+def _message_from_change(change):
+    document_id = change["documentKey"]["_id"]
+    if change["ns"]["coll"] == "events":
+        return {"type": "attendee_count", "event_id": str(document_id),
+                "attendee_count": change["updateDescription"]["updatedFields"]["attendee_count"]}
+    if change["operationType"] == "insert":
+        return _comment_message(change["fullDocument"])
+    # Deletes only carry the _id, so every subscriber gets them
+    return {"type": "comment_deleted", "event_id": None, "comment_id": str(document_id)}
+
+
+class Broadcaster:
+    """
+    Fans changes out to in-process subscribers. ``deliver`` callbacks run on
+    the watcher thread and must not block.
+    """
+    def __init__(self):
+        self._subscribers = {}  # event_id -> set of deliver callbacks
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._resume_token = None
+        self.published = 0
+
+    def subscribe(self, event_ids, deliver):
+        """
+        Call ``deliver(message)`` for changes to any of ``event_ids``.
+        Returns a function that cancels the subscription.
+        """
+        with self._lock:
+            for event_id in event_ids:
+                self._subscribers.setdefault(event_id, set()).add(deliver)
+            # Started lazily in each process, like the MongoDB client
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="stream-watcher", daemon=True)
+                self._thread.start()
+
+        def unsubscribe():
+            with self._lock:
+                for event_id in event_ids:
+                    callbacks = self._subscribers.get(event_id)
+                    if callbacks is not None:
+                        callbacks.discard(deliver)
+                        if not callbacks:
+                            del self._subscribers[event_id]
+        return unsubscribe
+
+    def subscribed_ids(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def publish(self, message):
+        with self._lock:
+            if message["event_id"] is None:
+                targets = set().union(*self._subscribers.values())
+            else:
+                targets = set(self._subscribers.get(message["event_id"], ()))
+            self.published += 1
+        for deliver in targets:
+            deliver(message)
+
+    def metrics_lines(self):
+        with self._lock:
+            subscriptions = sum(len(callbacks) for callbacks in self._subscribers.values())
+            events = len(self._subscribers)
+            published = self.published
+        return [
+            "# TYPE sse_subscriptions gauge", f"sse_subscriptions {subscriptions}",
+            "# TYPE sse_subscribed_events gauge", f"sse_subscribed_events {events}",
+            "# TYPE sse_messages_published_total counter", f"sse_messages_published_total {published}",
+        ]
+
+    def _run(self):
+        mode = STREAM_MODE
+        while True:
+            try:
+                if mode == "poll":
+                    self._poll()
+                else:
+                    self._watch()
+            except OperationFailure as e:
+                if mode == "auto" and e.code in _CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams unavailable; polling every %ss", POLL_INTERVAL)
+                    mode = "poll"
+                    continue
+                if e.code in _CHANGE_STREAM_NOT_RESUMABLE or e.has_error_label("NonResumableChangeStreamError"):
+                    # Changes since the token are lost; _watch re-sends the counts when it restarts
+                    self._resume_token = None
+                logger.warning("Stream watcher error: %s", e)
+            except Exception as e:
+                logger.exception("Stream watcher error: %s", e)
+            time.sleep(RETRY_SECONDS)
+
+    def _resync(self):
+        """
+        Send every subscribed event's current attendee count.
+        """
+        object_ids = [ObjectId(event_id) for event_id in self.subscribed_ids() if ObjectId.is_valid(event_id)]
+        if object_ids:
+            for event in events_collection.find({"_id": {"$in": object_ids}}, {"attendee_count": 1}):
+                self.publish(attendee_count_message(event))
+
+    def _watch(self):
+        with get_db().watch(_CHANGE_PIPELINE, resume_after=self._resume_token) as stream:
+            if self._resume_token is None:
+                # Taken once the stream is open, so it covers everything before
+                self._resync()
+            for change in stream:
+                self._resume_token = stream.resume_token
+                self.publish(_message_from_change(change))
+
+    def _poll(self):
+        counts = {}
+        started_at = datetime.now(timezone.utc)
+        sent_comments = set()
+        while True:
+            event_ids = self.subscribed_ids()
+            if event_ids:
+                object_ids = [ObjectId(event_id) for event_id in event_ids if ObjectId.is_valid(event_id)]
+                seen = {}
+                for event in events_collection.find({"_id": {"$in": object_ids}}, {"attendee_count": 1}):
+                    message = attendee_count_message(event)
+                    seen[message["event_id"]] = message["attendee_count"]
+                    # An event polled for the first time is sent too: its
+                    # subscribers' snapshot may predate this poll
+                    if counts.get(message["event_id"]) != message["attendee_count"]:
+                        self.publish(message)
+                counts = seen
+
+                since = max(started_at, datetime.now(timezone.utc) - timedelta(seconds=POLL_COMMENT_LOOKBACK_SECONDS))
+                since_id = ObjectId.from_datetime(since)
+                sent_comments = {comment_id for comment_id in sent_comments if comment_id >= since_id}
+                for comment in comments_collection.find(
+                    {"event_id": {"$in": event_ids}, "_id": {"$gte": since_id}}
+                ).sort("_id", 1):
+                    if comment["_id"] not in sent_comments:
+                        sent_comments.add(comment["_id"])
+                        self.publish(_comment_message(comment))
+            time.sleep(POLL_INTERVAL)
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,50 @@
+# test_event_routes.py
+import base64
+import json
+import pytest
+from bson.objectid import ObjectId
+import database
+
+
+def _cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+def _page_through(client, path, limit):
+    titles, token = [], None
+    while True:
+        response = client.get(f"{path}?limit={limit}" + (f"&cursor={token}" if token else ""))
+        assert response.status_code == 200
+        body = response.get_json()
+        titles += [event["title"] for event in body["events"]]
+        token = body["next"]
+        if token is None:
+            return titles
+
+
+@pytest.mark.parametrize("data", [
+    {"d": {"$ne": None}, "i": str(ObjectId())},
+    {"d": True, "i": str(ObjectId())},
+    {"d": "2030-01-01", "i": {"$ne": None}},
+    {"d": "2030-01-01", "i": "not-an-id"},
+    {"d": "2030-01-01"},
+    ["2030-01-01", str(ObjectId())],
+])
+def test_listing_rejects_crafted_cursors(client, data):
+    response = client.get(f"/api/events/all?limit=2&cursor={_cursor(data)}")
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid cursor"}
+
+
+def test_listing_pages_events_without_a_date_exactly_once(client):
+    events = database.get_client()[database.database_name()].events
+    # Stored null and missing dates sort first, then "", then real dates
+    events.insert_many([{"title": "null", "date": None}, {"title": "missing"}])
+    events.insert_many([{"title": f"empty {index}", "date": ""} for index in range(2)])
+    events.insert_many([{"title": f"dated {index}", "date": f"2030-01-0{index + 1}"} for index in range(3)])
+    expected = [event["title"] for event in client.get("/api/events/all").get_json()]
+
+    for limit in (1, 2, 3):
+        assert _page_through(client, "/api/events/all", limit) == expected
+    assert len(expected) == 7
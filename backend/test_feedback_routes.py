@@ -0,0 +1,39 @@
+# test_feedback_routes.py
+from datetime import datetime, timedelta, timezone
+
+
+def _iso(when):
+    # The frontend's toISOString() format
+    return when.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _create_and_register(client, title, date, user_id="u1"):
+    response = client.post("/api/events/create", json={
+        "title": title, "description": "d", "date": date, "location": "Pune", "organizer_id": "o1"})
+    event_id = response.get_json()["event_id"]
+    client.post(f"/api/events/register/{event_id}", json={"user_id": user_id})
+    return event_id
+
+
+def test_pending_feedback_compares_utc_dates(client):
+    now = datetime.now(timezone.utc)
+    _create_and_register(client, "past", _iso(now - timedelta(minutes=20)))
+    _create_and_register(client, "upcoming", _iso(now + timedelta(minutes=20)))
+
+    response = client.get("/api/feedback/pending/u1")
+
+    assert response.status_code == 200
+    assert [event["title"] for event in response.get_json()] == ["past"]
+
+
+def test_pending_feedback_skips_reviewed_and_undated_events(client):
+    reviewed = _create_and_register(client, "reviewed", "2020-01-01T10:00:00.000Z")
+    _create_and_register(client, "naive", "2020-01-02T10:00:00")
+    _create_and_register(client, "undated", "")
+    response = client.post(f"/api/feedback/submit/{reviewed}", json={"user_id": "u1", "rating": 5})
+    assert response.status_code == 201
+
+    response = client.get("/api/feedback/pending/u1")
+
+    assert response.status_code == 200
+    assert [event["title"] for event in response.get_json()] == ["naive"]
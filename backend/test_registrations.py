@@ -0,0 +1,17 @@
+# test_registrations.py
+import pytest
+from database import DATABASE_NAME
+from indexes import sync_indexes
+from registrations import check_concurrent_registrations
+
+
+def test_concurrency_check_refuses_default_database(monkeypatch):
+    monkeypatch.delenv("MONGO_DB_NAME", raising=False)
+    with pytest.raises(SystemExit, match=DATABASE_NAME):
+        check_concurrent_registrations(users=1, threads=1, repeats=1)
+
+
+def test_concurrency_check_counts_each_user_once(client, monkeypatch):
+    monkeypatch.setenv("MONGO_DB_NAME", "Eventdb_test")
+    sync_indexes()  # The unique registration index is what makes repeats no-ops
+    assert check_concurrent_registrations(users=20, threads=4, repeats=2) == (20, 20, 20)
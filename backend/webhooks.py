@@ -0,0 +1,217 @@
+# webhooks.py
+"""
+Durable inbox for Stripe webhook events.
+
+The webhook route only verifies the signature and inserts the event into the
+``stripe_events`` collection keyed by Stripe's event id (so redeliveries are
+dropped by the unique ``_id``), then acknowledges Stripe. Worker threads claim
+pending events in batches, apply them, and retry failures with backoff until
+``MAX_ATTEMPTS``, after which the event is dead-lettered for inspection.
+
+Nothing is applied unless a worker runs. Each web process starts
+``WEBHOOK_INPROCESS_WORKERS`` threads (default 1); set it to 0 only when
+``flask webhook-worker`` runs as its own process.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import stripe_events_collection
+from registrations import register_user, EventNotFound
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+DEAD = "dead"
+
+MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
+LEASE_SECONDS = int(os.getenv("WEBHOOK_LEASE_SECONDS", "60"))
+IDLE_SLEEP_SECONDS = float(os.getenv("WEBHOOK_IDLE_SLEEP_SECONDS", "1"))
+
+
+class PermanentError(Exception):
+    """An event that can never succeed; dead-lettered without retrying."""
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def enqueue_event(event):
+    """
+    Persist a verified Stripe event. Returns False if it was already received.
+    """
+    now = _now()
+    try:
+        stripe_events_collection.insert_one({
+            "_id": event["id"],
+            "type": event["type"],
+            "data": event.get("data", {}),
+            "status": PENDING,
+            "attempts": 0,
+            "received_at": now,
+            "next_attempt_at": now
+        })
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+def _claim_one():
+    now = _now()
+    return stripe_events_collection.find_one_and_update(
+        {"$or": [
+            {"status": PENDING, "next_attempt_at": {"$lte": now}},
+            # Reclaim events whose worker died mid-processing
+            {"status": PROCESSING, "locked_until": {"$lte": now}}
+        ]},
+        {"$set": {"status": PROCESSING, "locked_until": now + timedelta(seconds=LEASE_SECONDS)},
+         "$inc": {"attempts": 1}},
+        sort=[("next_attempt_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def claim_batch(size=BATCH_SIZE):
+    batch = []
+    while len(batch) < size:
+        event = _claim_one()
+        if event is None:
+            break
+        batch.append(event)
+    return batch
+
+
+def handle_checkout_completed(session):
+    metadata = session.get("metadata") or {}
+    event_id = metadata.get("event_id")
+    user_id = metadata.get("user_id")
+    session_id = session.get("id")
+    if not event_id or not user_id:
+        return
+
+    if not ObjectId.is_valid(event_id):
+        raise PermanentError(f"Invalid event ID format: {event_id}")
+
+    try:
+        register_user(event_id, user_id, session_id)
+    except EventNotFound:
+        raise PermanentError(f"Event not found: {event_id}")
+
+
+HANDLERS = {
+    "checkout.session.completed": handle_checkout_completed,
+}
+
+
+def process_event(event):
+    handler = HANDLERS.get(event["type"])
+    try:
+        if handler is not None:
+            handler(event["data"].get("object", {}))
+    except PermanentError as e:
+        _dead_letter(event, str(e))
+        return False
+    except Exception as e:
+        if event["attempts"] >= MAX_ATTEMPTS:
+            _dead_letter(event, str(e))
+        else:
+            # Exponential backoff: 2s, 4s, 8s, ... capped at 10 minutes
+            delay = min(2 ** event["attempts"], 600)
+            stripe_events_collection.update_one(
+                {"_id": event["_id"]},
+                {"$set": {"status": PENDING, "last_error": str(e),
+                          "next_attempt_at": _now() + timedelta(seconds=delay)},
+                 "$unset": {"locked_until": ""}}
+            )
+        return False
+
+    stripe_events_collection.update_one(
+        {"_id": event["_id"]},
+        {"$set": {"status": DONE, "processed_at": _now()}, "$unset": {"locked_until": "", "last_error": ""}}
+    )
+    return True
+
+
+def _dead_letter(event, error):
+    logger.warning("Dead-lettering Stripe event %s: %s", event["_id"], error)
+    stripe_events_collection.update_one(
+        {"_id": event["_id"]},
+        {"$set": {"status": DEAD, "last_error": error, "dead_at": _now()}, "$unset": {"locked_until": ""}}
+    )
+
+
+def drain_once(batch_size=BATCH_SIZE):
+    """
+    Claim and process one batch. Returns the number of events claimed.
+    """
+    batch = claim_batch(batch_size)
+    for event in batch:
+        process_event(event)
+    return len(batch)
+
+
+def requeue_dead_events():
+    """
+    Put dead-lettered events back in the queue with a fresh attempt budget.
+    """
+    result = stripe_events_collection.update_many(
+        {"status": DEAD},
+        {"$set": {"status": PENDING, "attempts": 0, "next_attempt_at": _now()}, "$unset": {"dead_at": ""}}
+    )
+    return result.modified_count
+
+
+class WebhookWorkerPool:
+    """
+    Threads that drain the inbox until ``stop()`` is called.
+    """
+    def __init__(self, workers=2, batch_size=BATCH_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._threads = []
+        self.pid = None
+
+    def start(self):
+        self.pid = os.getpid()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"webhook-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = drain_once(self.batch_size)
+            except Exception as e:
+                logger.exception("Webhook worker error: %s", e)
+                claimed = 0
+            if not claimed:
+                self._stop.wait(IDLE_SLEEP_SECONDS)
+
+
+def run_workers(workers=2):
+    """
+    Run a worker pool in the foreground until interrupted.
+    """
+    pool = WebhookWorkerPool(workers).start()
+    logger.info("Draining Stripe webhook inbox with %d workers", workers)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -127,8 +127,10 @@ const EventCard = ({ event, formatDate, truncateDescription }) => {
       
       if (response.ok) {
         const data = await response.json();
-        // Add the new comment to the existing comments
-        setComments(prevComments => [data.comment, ...prevComments]);
+        // Add the new comment unless the live stream already delivered it
+        setComments(prevComments => 
+          prevComments.some(c => c._id === data.comment._id) ? prevComments : [data.comment, ...prevComments]
+        );
         setNewComment(''); // Clear the input field
       } else {
         const errorData = await response.json();
@@ -142,6 +144,25 @@ const EventCard = ({ event, formatDate, truncateDescription }) => {
     }
   };
 
+  // While comments are open, receive new and deleted comments as they happen
+  useEffect(() => {
+    if (!showComments || !eventId) return;
+    
+    const source = new EventSource(`http://localhost:5000/api/events/${eventId}/stream`);
+    source.addEventListener('comment', (e) => {
+      const { comment } = JSON.parse(e.data);
+      setComments(prevComments => 
+        prevComments.some(c => c._id === comment._id) ? prevComments : [comment, ...prevComments]
+      );
+    });
+    source.addEventListener('comment_deleted', (e) => {
+      const { comment_id } = JSON.parse(e.data);
+      setComments(prevComments => prevComments.filter(c => c._id !== comment_id));
+    });
+    
+    return () => source.close();
+  }, [showComments, eventId]);
+
   // Handle comment button click
   const handleCommentClick = () => {
     setShowComments(!showComments);
@@ -5,8 +5,10 @@ import FeedbackForm from './FeedbackForm';
 
 const RegisteredEvents = () => {
   const [registeredEvents, setRegisteredEvents] = useState([]);
+  const [nextCursors, setNextCursors] = useState({});
   const [pendingFeedback, setPendingFeedback] = useState([]);
   const [eventFeedbacks, setEventFeedbacks] = useState({});
+  const [feedbackSummaries, setFeedbackSummaries] = useState({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [selectedEvent, setSelectedEvent] = useState(null);
@@ -14,7 +16,23 @@ const RegisteredEvents = () => {
   
   const { user } = useUser();
   
-  // Function to fetch feedback for a specific event
+  // Fetch rating summaries for many events in a single request
+  const fetchFeedbackSummaries = async (eventIds) => {
+    if (eventIds.length === 0) return;
+    try {
+      const response = await fetch(`http://localhost:5000/api/feedback/summaries?event_ids=${eventIds.join(',')}`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! Status: ${response.status}`);
+      }
+      
+      const summaries = await response.json();
+      setFeedbackSummaries(prev => ({ ...prev, ...summaries }));
+    } catch (err) {
+      console.error('Error fetching feedback summaries:', err);
+    }
+  };
+  
+  // Function to fetch the feedback comments for a specific event
   const fetchEventFeedback = async (eventId) => {
     try {
       const response = await fetch(`http://localhost:5000/api/feedback/event/${eventId}`);
@@ -42,20 +60,17 @@ const RegisteredEvents = () => {
       try {
         setLoading(true);
         
-        // Fetch all events
-        const eventsResponse = await fetch('http://localhost:5000/api/events/all');
+        // Fetch the first page of the user's upcoming and past events
+        const eventsResponse = await fetch(`http://localhost:5000/api/events/registered/${user.id}`);
         if (!eventsResponse.ok) {
           throw new Error(`HTTP error! Status: ${eventsResponse.status}`);
         }
         
-        const allEvents = await eventsResponse.json();
-        
-        // Filter events where user is an attendee
-        const userEvents = allEvents.filter(event => 
-          event.attendees && event.attendees.includes(user.id)
-        );
+        const { upcoming, past } = await eventsResponse.json();
         
-        setRegisteredEvents(userEvents);
+        setRegisteredEvents([...upcoming.events, ...past.events]);
+        setNextCursors({ upcoming: upcoming.next, past: past.next });
+        fetchFeedbackSummaries(past.events.map(event => event._id));
         
         // Fetch pending feedback events
         const pendingResponse = await fetch(`http://localhost:5000/api/feedback/pending/${user.id}`);
@@ -77,6 +92,27 @@ const RegisteredEvents = () => {
     fetchRegisteredEvents();
   }, [user]);
   
+  // Fetch the next page of upcoming or past events
+  const loadMore = async (status) => {
+    try {
+      const response = await fetch(
+        `http://localhost:5000/api/events/registered/${user.id}?status=${status}&cursor=${nextCursors[status]}`
+      );
+      if (!response.ok) {
+        throw new Error(`HTTP error! Status: ${response.status}`);
+      }
+      
+      const page = await response.json();
+      setRegisteredEvents(prev => [...prev, ...page.events]);
+      setNextCursors(prev => ({ ...prev, [status]: page.next }));
+      if (status === 'past') {
+        fetchFeedbackSummaries(page.events.map(event => event._id));
+      }
+    } catch (err) {
+      console.error(`Error loading more ${status} events:`, err);
+    }
+  };
+  
   const handleFeedbackSubmit = (data) => {
     // Remove the event from pending feedback list
     setPendingFeedback(prev => prev.filter(event => event._id !== selectedEvent._id));
@@ -112,6 +148,9 @@ const RegisteredEvents = () => {
     }
   };
   
+  // Rating summary for the feedback modal; the batch summary shows while comments load
+  const viewedSummary = viewingFeedback && (eventFeedbacks[viewingFeedback] || feedbackSummaries[viewingFeedback]);
+  
   if (loading) {
     return (
       <div className="flex justify-center items-center py-12">
@@ -183,7 +222,9 @@ const RegisteredEvents = () => {
                   {!isUpcoming(event.date) && (
                     <button
                       onClick={() => {
-                        fetchEventFeedback(event._id);
+                        if (!eventFeedbacks[event._id]) {
+                          fetchEventFeedback(event._id);
+                        }
                         setViewingFeedback(event._id);
                       }}
                       className="w-full mt-2 py-2 px-4 border border-transparent rounded-md shadow-sm text-sm font-medium text-white bg-indigo-600 hover:bg-indigo-700 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-indigo-500 transition-colors duration-150"
@@ -199,6 +240,20 @@ const RegisteredEvents = () => {
             ))}
           </div>
         )}
+        
+        {(nextCursors.upcoming || nextCursors.past) && (
+          <div className="flex justify-center gap-4 mt-6">
+            {['upcoming', 'past'].filter(status => nextCursors[status]).map(status => (
+              <button
+                key={status}
+                onClick={() => loadMore(status)}
+                className="py-2 px-4 border border-gray-300 rounded-md text-sm font-medium text-gray-700 bg-white hover:bg-gray-50 transition-colors duration-150"
+              >
+                Load more {status} events
+              </button>
+            ))}
+          </div>
+        )}
       </div>
       
       {/* Pending Feedback Section */}
@@ -287,23 +342,23 @@ const RegisteredEvents = () => {
                 </button>
               </div>
               
-              {eventFeedbacks[viewingFeedback] ? (
+              {viewedSummary ? (
                 <div className="space-y-4">
                   <div className="text-center mb-4">
                     <div className="flex items-center justify-center mb-2">
                       {[1, 2, 3, 4, 5].map((star) => (
                         <Star 
                           key={star}
-                          className={`w-6 h-6 ${star <= eventFeedbacks[viewingFeedback].average_rating ? 'text-yellow-400 fill-yellow-400' : 'text-gray-300'}`} 
+                          className={`w-6 h-6 ${star <= viewedSummary.average_rating ? 'text-yellow-400 fill-yellow-400' : 'text-gray-300'}`} 
                         />
                       ))}
                     </div>
-                    <p className="text-lg font-medium">{eventFeedbacks[viewingFeedback].average_rating.toFixed(1)} out of 5</p>
-                    <p className="text-sm text-gray-500">{eventFeedbacks[viewingFeedback].count} {eventFeedbacks[viewingFeedback].count === 1 ? 'review' : 'reviews'}</p>
+                    <p className="text-lg font-medium">{viewedSummary.average_rating.toFixed(1)} out of 5</p>
+                    <p className="text-sm text-gray-500">{viewedSummary.count} {viewedSummary.count === 1 ? 'review' : 'reviews'}</p>
                   </div>
                   
                   <div className="divide-y divide-gray-200">
-                    {eventFeedbacks[viewingFeedback].feedbacks.map((feedback) => (
+                    {(eventFeedbacks[viewingFeedback]?.feedbacks || []).map((feedback) => (
                       <div key={feedback._id} className="py-4">
                         <div className="flex items-center mb-1">
                           {[1, 2, 3, 4, 5].map((star) => (
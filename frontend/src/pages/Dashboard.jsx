@@ -7,6 +7,7 @@ import Navbar from '../components/Navbar';
 const Dashboard = () => {
     const [events, setEvents] = useState([]);
     const [searchQuery, setSearchQuery] = useState("");
+    const [searchResults, setSearchResults] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [activeFilter, setActiveFilter] = useState("all");
@@ -52,21 +53,69 @@ const Dashboard = () => {
             });
     }, []);
     
-    // Apply filters and search
-    const filteredEvents = Array.isArray(events) ? events.filter(event => {
-        const searchIn = (event.title || event.name || event.eventName || "").toLowerCase();
-        const matchesSearch = searchIn.includes(searchQuery.toLowerCase());
+    // Live attendee counts for the loaded events over one Server-Sent Events connection
+    const streamIds = Array.isArray(events) ? events.slice(0, 200).map(event => event._id).join(',') : '';
+    useEffect(() => {
+        if (!streamIds) return;
+        
+        const source = new EventSource(`http://localhost:5000/api/events/stream?ids=${streamIds}`);
+        source.addEventListener('attendee_count', (e) => {
+            const { event_id, attendee_count } = JSON.parse(e.data);
+            const update = (list) => list && list.map(event => 
+                event._id === event_id ? { ...event, attendee_count } : event
+            );
+            setEvents(update);
+            setSearchResults(update);
+        });
+        
+        return () => source.close();
+    }, [streamIds]);
+    
+    // Search on the server (title, description and location), debounced while typing
+    useEffect(() => {
+        const query = searchQuery.trim();
+        if (!query) {
+            setSearchResults(null);
+            return;
+        }
         
-        if (activeFilter === "all") return matchesSearch;
+        const controller = new AbortController();
+        const timer = setTimeout(() => {
+            fetch(`http://localhost:5000/api/events/search?q=${encodeURIComponent(query)}&limit=100`, {
+                signal: controller.signal
+            })
+                .then((response) => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP error! Status: ${response.status}`);
+                    }
+                    return response.json();
+                })
+                .then((data) => setSearchResults(data.events))
+                .catch((error) => {
+                    if (error.name !== 'AbortError') {
+                        console.error("Error searching events:", error);
+                    }
+                });
+        }, 300);
+        
+        return () => {
+            clearTimeout(timer);
+            controller.abort();
+        };
+    }, [searchQuery]);
+    
+    // Apply filters to the search results, or to all events when not searching
+    const sourceEvents = searchResults ?? events;
+    const filteredEvents = Array.isArray(sourceEvents) ? sourceEvents.filter(event => {
         if (activeFilter === "upcoming") {
             const eventDate = new Date(event.date);
-            return matchesSearch && eventDate >= new Date();
+            return eventDate >= new Date();
         }
         if (activeFilter === "past") {
             const eventDate = new Date(event.date);
-            return matchesSearch && eventDate < new Date();
+            return eventDate < new Date();
         }
-        return matchesSearch;
+        return true;
     }) : [];
     
     // Function to format date